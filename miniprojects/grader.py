@@ -1,11 +1,23 @@
 from collections import namedtuple
 from functools import wraps
 from importlib import import_module
+from multiprocessing.pool import ThreadPool
+from StringIO import StringIO
+import gzip
+import hashlib
 import json
+import multiprocessing
 import os
+import re
 import requests
 import sys
+import tempfile
+import time
+import urllib
 import jsonschema
+import numpy as np
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
 
 from typecheck import get_validator
 from static_grader import SerializedSubmission, SerializedScore, SerializedQuestion
@@ -27,6 +39,48 @@ except IOError: # for local dev / general issues
   print "Please show this message to a TDI staff member."
   SECRET_GRADER_KEY = 'bcgzmGuIB9yAlmshSuLy'
 
+# (connect, read) timeouts in seconds for requests to the grader
+REQUEST_TIMEOUT = (10, 120)
+# Retries for failed connections and 502/503/504 responses. Submissions
+# (POST) are only retried if the connection failed before sending them.
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5
+# gzip submission bodies (the server must accept Content-Encoding: gzip)
+COMPRESS_SUBMISSIONS = os.environ.get("GRADER_COMPRESS", "") == "1"
+
+_session = None
+_submit_pool = None
+
+def get_session():
+  """
+  Return the shared requests.Session, keeping connections to BASE_URL alive.
+  """
+  global _session
+  if _session is None:
+    retry = Retry(total=MAX_RETRIES, backoff_factor=RETRY_BACKOFF,
+                  status_forcelist=(502, 503, 504))
+    _session = requests.Session()
+    _session.mount('http://', HTTPAdapter(max_retries=retry))
+    _session.mount('https://', HTTPAdapter(max_retries=retry))
+  return _session
+
+def _get_submit_pool():
+  global _submit_pool
+  if _submit_pool is None:
+    _submit_pool = ThreadPool(1)
+  return _submit_pool
+
+def _post_form(url, data):
+  if not COMPRESS_SUBMISSIONS:
+    return get_session().post(url, data=data, timeout=REQUEST_TIMEOUT)
+  buf = StringIO()
+  with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+    f.write(urllib.urlencode(data))
+  headers = {'Content-Encoding': 'gzip',
+             'Content-Type': 'application/x-www-form-urlencoded'}
+  return get_session().post(url, data=buf.getvalue(), headers=headers,
+                            timeout=REQUEST_TIMEOUT)
+
 def is_invalid(answer, type_str):
   try:
     get_validator(type_str).validate(answer)
@@ -36,22 +90,106 @@ def is_invalid(answer, type_str):
   return None
 
 
-def test_cases_grading(question_name, func, test_cases):
+class TestCaseTimeout(Exception):
+  pass
+
+# The function being graded, inherited by forked worker processes so that
+# it doesn't need to be pickled.
+_worker_func = None
+
+def _init_worker(memory_limit):
+  if memory_limit is not None:
+    import resource
+    resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+def _run_test_case(test_case):
+  start = time.time()
+  result = _worker_func(*test_case['args'], **test_case['kwargs'])
+  return result, time.time() - start
+
+def run_test_cases(func, test_cases, processes=None, timeout=None, memory_limit=None):
+  """
+  Yield (result, seconds) for each test case, in the order of test_cases.
+
+  With processes=None the cases run one after another in this process,
+  and timeout and memory_limit can't be used. Otherwise they run
+  concurrently in a pool of forked worker processes, each limited to
+  memory_limit bytes of address space. The timeout is enforced from
+  this process: if a case takes longer than timeout seconds, or no
+  result arrives for that long, the pool is terminated and
+  TestCaseTimeout is raised. Closing the generator early stops the
+  remaining cases.
+
+  The workers are forked, so func must not depend on a TensorFlow
+  session (or other thread pools) created before run_test_cases is
+  called; create the session inside func instead.
+  """
+  global _worker_func
+  if processes is None:
+    if timeout is not None or memory_limit is not None:
+      raise ValueError("timeout and memory_limit need processes to be set")
+    for test_case in test_cases:
+      start = time.time()
+      result = func(*test_case['args'], **test_case['kwargs'])
+      yield result, time.time() - start
+    return
+
+  _worker_func = func
+  pool = multiprocessing.Pool(processes, _init_worker, (memory_limit,))
+  try:
+    results = pool.imap(_run_test_case, test_cases)
+    for index in xrange(len(test_cases)):
+      try:
+        result, elapsed = results.next(timeout)
+      except multiprocessing.TimeoutError:
+        elapsed = None
+      if elapsed is None or (timeout is not None and elapsed > timeout):
+        pool.terminate()
+        raise TestCaseTimeout("Test case %d took longer than %s seconds" % (index, timeout))
+      yield result, elapsed
+  finally:
+    pool.terminate()
+    _worker_func = None
+
+def test_cases_grading(question_name, func, test_cases, processes=None, timeout=None,
+                       memory_limit=None, background=False):
+  """
+  Run func on every test case and submit the results if they are valid.
+
+  With background=True the submission is sent from a background thread
+  and an AsyncResult is returned; its get() returns the score.
+  """
   res = []
-  for test_case in test_cases:
-    #test func with params in
-    sub_res = func(*test_case['args'], **test_case['kwargs'])
-    invalid = is_invalid(sub_res, test_case['type_str'])
-    if invalid:
-      print(invalid)
-      return
-    res.append(sub_res)
+  timings = []
+  cases = run_test_cases(func, test_cases, processes, timeout, memory_limit)
+  try:
+    for i, (sub_res, elapsed) in enumerate(cases):
+      invalid = is_invalid(sub_res, test_cases[i]['type_str'])
+      if invalid:
+        print(invalid)
+        return
+      res.append(sub_res)
+      timings.append(elapsed)
+  finally:
+    cases.close()
+
+  if processes is not None:
+    for i, elapsed in enumerate(timings):
+      print "Test case %d: %.3f s" % (i, elapsed)
 
   # Submission
 
+  if background:
+    return _get_submit_pool().apply_async(submit, (question_name, res))
+  return submit(question_name, res)
+
+def submit(question_name, res):
+  """
+  Post the results of a question to the grader, print and return the score.
+  """
   submission = SerializedSubmission(question_name=question_name, submission=res)
-  r = requests.post(BASE_URL + '/submission?api_key=%s' % SECRET_GRADER_KEY,
-                 data={'submission': submission.dumps()})
+  r = _post_form(BASE_URL + '/submission?api_key=%s' % SECRET_GRADER_KEY,
+                 {'submission': submission.dumps()})
   print "=================="
   try:
     score = SerializedScore.loads(r.text)
@@ -70,6 +208,7 @@ def test_cases_grading(question_name, func, test_cases):
   if score.error_msg:
     print score.error_msg
   print "=================="
+  return score
 
 def get_miniprojects():
   import glob
@@ -77,51 +216,234 @@ def get_miniprojects():
   miniprojects = [os.path.basename(n.strip("/")) for n in glob.glob(current_path + '/*/') if 'tests' not in n and 'lib' not in n]
   return miniprojects
 
-def score(question_name, func):
-  # Get test cases
-  resp = requests.get(BASE_URL + '/test_cases/%s?api_key=%s' % (question_name, SECRET_GRADER_KEY))
+# Test cases downloaded from the grader, revalidated with ETags
+TEST_CASE_CACHE_DIR = os.environ.get("GRADER_CACHE_DIR",
+                                     os.path.join(HOME_DIR, ".grader_cache"))
+# Numeric lists with at least this many elements are cached as arrays
+CACHE_ARRAY_MIN_SIZE = 1000
+
+def _cache_paths(question_name):
+  # The headers (ETag / Last-Modified) are read on every call, the test
+  # cases only when they are used. Each grader server has its own entries.
+  name = re.sub(r'[^\w.-]', '_', question_name)
+  server = hashlib.sha1(BASE_URL).hexdigest()[:10]
+  base = os.path.join(TEST_CASE_CACHE_DIR, '%s-%s' % (name, server))
+  return base + '.headers.json', base + '.json', base + '.npz'
+
+def _pack(value, arrays):
+  # Replace large numeric lists by references to arrays in `arrays`
+  if isinstance(value, dict):
+    return {key: _pack(val, arrays) for key, val in value.iteritems()}
+  if not isinstance(value, list):
+    return value
+  if len(value) and isinstance(value[0], (list, int, float, bool)):
+    try:
+      arr = np.asarray(value)
+    except ValueError:  # ragged nested lists
+      arr = np.asarray([])
+    if (arr.dtype.kind in 'bif' and arr.size >= CACHE_ARRAY_MIN_SIZE
+        # Only if converting back gives identical JSON (e.g. no mixed ints/floats)
+        and json.dumps(arr.tolist()) == json.dumps(value)):
+      key = 'arr_%d' % len(arrays)
+      arrays[key] = arr
+      return {'__npz__': key}
+  return [_pack(val, arrays) for val in value]
+
+def _unpack(value, arrays):
+  if isinstance(value, dict):
+    if '__npz__' in value:
+      return arrays[value['__npz__']].tolist()
+    return {key: _unpack(val, arrays) for key, val in value.iteritems()}
+  if isinstance(value, list):
+    return [_unpack(val, arrays) for val in value]
+  return value
+
+def _read_cache_headers(question_name):
+  # The ETag / Last-Modified of the cached test cases, without reading them
+  headers_path = _cache_paths(question_name)[0]
+  try:
+    with open(headers_path) as f:
+      cached = json.load(f)
+  except (IOError, ValueError):
+    return None
+  return cached if isinstance(cached, dict) else None
+
+def _read_cache(question_name, has_arrays):
+  _, json_path, npz_path = _cache_paths(question_name)
+  try:
+    with open(json_path) as f:
+      test_cases = json.load(f)
+    arrays = {}
+    if has_arrays:
+      with np.load(npz_path) as npz:
+        arrays = dict(npz)
+  except (IOError, ValueError):
+    return None
+  try:
+    return _unpack(test_cases, arrays)
+  except KeyError:
+    return None
+
+def _write_atomic(path, data):
+  # Write to a temporary file first, so readers never see a partial file
+  fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+  try:
+    with os.fdopen(fd, 'wb') as f:
+      f.write(data)
+    os.rename(tmp_path, path)
+  except:
+    os.remove(tmp_path)
+    raise
+
+def _write_cache(question_name, test_cases, headers):
+  headers_path, json_path, npz_path = _cache_paths(question_name)
+  if not os.path.isdir(TEST_CASE_CACHE_DIR):
+    os.makedirs(TEST_CASE_CACHE_DIR)
+  # Drop the old headers first, so they never describe other test cases
+  if os.path.exists(headers_path):
+    os.remove(headers_path)
+  arrays = {}
+  packed = _pack(test_cases, arrays)
+  if arrays:
+    npz = StringIO()
+    np.savez(npz, **arrays)
+    _write_atomic(npz_path, npz.getvalue())
+  _write_atomic(json_path, json.dumps(packed))
+  _write_atomic(headers_path, json.dumps({'etag': headers.get('ETag'),
+                                          'last_modified': headers.get('Last-Modified'),
+                                          'has_arrays': bool(arrays)}))
+
+def get_test_cases(question_name, use_cache=True):
+  """
+  Return the test cases of question_name, or None if there is no such question.
+
+  Test cases are cached in TEST_CASE_CACHE_DIR and only downloaded again
+  if the server reports they changed (ETag / Last-Modified). If the server
+  can't be reached, the cached copy is used.
+  """
+  url = BASE_URL + '/test_cases/%s?api_key=%s' % (question_name, SECRET_GRADER_KEY)
+  # Only the cached headers are read here; the test cases are only loaded
+  # when the server says they are still current, or can't be reached
+  cached = _read_cache_headers(question_name) if use_cache else None
+  headers = {}
+  if cached is not None:
+    if cached.get('etag'):
+      headers['If-None-Match'] = cached['etag']
+    if cached.get('last_modified'):
+      headers['If-Modified-Since'] = cached['last_modified']
+
+  try:
+    resp = get_session().get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+  except requests.exceptions.RequestException as e:
+    test_cases = None
+    if cached is not None:
+      test_cases = _read_cache(question_name, cached.get('has_arrays'))
+    if test_cases is None:
+      raise
+    print "WARNING: Could not reach the grader ({}). Using cached test cases.".format(e)
+    return test_cases
+
+  if resp.status_code == 304 and cached is not None:
+    test_cases = _read_cache(question_name, cached.get('has_arrays'))
+    if test_cases is not None:
+      return test_cases
+    # The cached test cases are unreadable, so download them again
+    resp = get_session().get(url, timeout=REQUEST_TIMEOUT)
   if resp.status_code != 200:
-    print "No question found:", question_name
-    return
+    return None
   test_cases = json.loads(resp.text)
-  test_cases_grading(question_name, func, test_cases)
+  if use_cache:
+    try:
+      _write_cache(question_name, test_cases, resp.headers)
+    except (IOError, OSError) as e:
+      print "WARNING: Could not cache test cases:", e
+  return test_cases
 
-# for local dev
-def local_score(question_name, func):
+def score(question_name, func, **kwargs):
   """
-  Score locally in developer mode
+  Grade func on the test cases of question_name and submit the results.
+
+  Keyword arguments are passed on to test_cases_grading: processes,
+  timeout and memory_limit run the test cases in parallel, and
+  background=True submits without waiting for the score.
   """
-  # call this here because students don't have scorers
-  from static_grader import scorers
-  import inspect
-  #reload(scorers)
-  #scorers_by_name = dict(inspect.getmembers(scorers))
-  scorers_by_name = scorers.DICT_SCORERS
-  
+  # Get test cases
+  test_cases = get_test_cases(question_name)
+  if test_cases is None:
+    print "No question found:", question_name
+    return
+  return test_cases_grading(question_name, func, test_cases, **kwargs)
+
+# for local dev
+LocalScore = namedtuple('LocalScore', ['score', 'case_scores'])
+
+# Questions of the miniprojects imported so far, by question name
+_local_questions = {}
+_local_projects = set()
+# Scorer instances, by question name
+_local_scorers = {}
+
+def _load_questions(question_name, reload_projects=False):
   # Try to guess which project we want, based on question prefix
   miniprojects = get_miniprojects()
   prefixed_projects = [mp for mp in miniprojects if mp.lower() == question_name.split('__')[0]]
   if prefixed_projects:
     miniprojects = prefixed_projects
-  all_questions = {}
   for miniproject in miniprojects:
+    if miniproject in _local_projects and not reload_projects:
+      continue
     module = import_module(miniproject)
-    reload(module)
+    if reload_projects:
+      reload(module)
     for question in module.questions:
-      all_questions[question['name']] = question
-
-  q = all_questions[question_name]
-  test_cases = q['test_cases']
-  for test_case in test_cases:
-    result = func(*test_case['args'], **test_case['kwargs'])
-    invalid = is_invalid(result, test_case['type_str'])
-    if invalid:
-      print(invalid)
-      return
-
-    answer = test_case['answer']
-    Scorer = scorers_by_name[q['scorer_name']](**q['scorer_params'])
-    return Scorer.score(result, answer)
+      _local_questions[question['name']] = question
+      _local_scorers.pop(question['name'], None)
+    _local_projects.add(miniproject)
+
+def _get_scorer(question_name):
+  # call this here because students don't have scorers
+  from static_grader import scorers
+  if question_name not in _local_scorers:
+    q = _local_questions[question_name]
+    _local_scorers[question_name] = scorers.DICT_SCORERS[q['scorer_name']](**q['scorer_params'])
+  return _local_scorers[question_name]
+
+def local_score(question_name, func, reload_projects=False, **kwargs):
+  """
+  Score locally in developer mode
+
+  Every test case is run (see run_test_cases for the keyword arguments)
+  and validated before any of them is scored. Each result is then scored
+  on its own, since the static_grader scorers take one result at a time;
+  the scores are not computed in a batch. Returns a LocalScore with the
+  mean score and an array of the per-case scores.
+
+  Miniproject modules and scorers are loaded once and reused; pass
+  reload_projects=True to pick up edits to the question definitions.
+  """
+  if reload_projects or question_name not in _local_questions:
+    _load_questions(question_name, reload_projects)
+  test_cases = _local_questions[question_name]['test_cases']
+  Scorer = _get_scorer(question_name)
+  # Nothing is submitted when scoring locally.
+  kwargs.pop('background', None)
+
+  results = []
+  cases = run_test_cases(func, test_cases, **kwargs)
+  try:
+    for i, (result, _) in enumerate(cases):
+      invalid = is_invalid(result, test_cases[i]['type_str'])
+      if invalid:
+        print(invalid)
+        return
+      results.append(result)
+  finally:
+    cases.close()
+
+  case_scores = np.array([Scorer.score(result, test_case['answer'])
+                          for result, test_case in zip(results, test_cases)],
+                         dtype=float)
+  return LocalScore(score=case_scores.mean(), case_scores=case_scores)
 
 client_mode = os.environ.get("GRADER_CLIENT_MODE", None)
 if client_mode == "local":
@@ -0,0 +1,235 @@
+import json
+import sys
+import time
+
+import pytest
+
+pytest.importorskip('static_grader')
+import grader
+
+
+def add(a, b=0):
+  return a + b
+
+def nap(seconds):
+  time.sleep(seconds)
+  return seconds
+
+def cases(*args_list):
+  return [{'args': args, 'kwargs': {}} for args in args_list]
+
+
+def test_run_test_cases_serial():
+  results = list(grader.run_test_cases(add, cases((1, 2), (3, 4))))
+  assert [result for result, _ in results] == [3, 7]
+
+
+def test_run_test_cases_pool_keeps_order():
+  results = grader.run_test_cases(nap, cases((0.2,), (0,), (0.1,)), processes=3)
+  assert [result for result, _ in results] == [0.2, 0, 0.1]
+
+
+def test_run_test_cases_timeout():
+  results = grader.run_test_cases(nap, cases((0,), (5,)), processes=2, timeout=0.5)
+  assert next(results)[0] == 0
+  start = time.time()
+  with pytest.raises(grader.TestCaseTimeout):
+    next(results)
+  assert time.time() - start < 2
+
+
+def test_limits_need_a_pool():
+  with pytest.raises(ValueError):
+    list(grader.run_test_cases(add, cases((1,)), timeout=1))
+
+
+class CountingScorer(object):
+  instances = 0
+
+  def __init__(self, tolerance):
+    CountingScorer.instances += 1
+    self.tolerance = tolerance
+
+  def score(self, result, answer):
+    return float(abs(result - answer) <= self.tolerance)
+
+
+@pytest.fixture
+def toy_project(monkeypatch):
+  import types
+  import static_grader
+  project = types.ModuleType('toyproject')
+  project.questions = [{
+    'name': 'toyproject__add',
+    'scorer_name': 'counting',
+    'scorer_params': {'tolerance': 0},
+    'test_cases': [{'args': (1, 2), 'kwargs': {}, 'type_str': 'number', 'answer': 3},
+                   {'args': (2, 2), 'kwargs': {}, 'type_str': 'number', 'answer': 4},
+                   {'args': (0, 1), 'kwargs': {}, 'type_str': 'number', 'answer': 2}],
+  }]
+  scorers = types.ModuleType('static_grader.scorers')
+  scorers.DICT_SCORERS = {'counting': CountingScorer}
+  monkeypatch.setitem(sys.modules, 'toyproject', project)
+  monkeypatch.setitem(sys.modules, 'static_grader.scorers', scorers)
+  monkeypatch.setattr(static_grader, 'scorers', scorers, raising=False)
+  monkeypatch.setattr(grader, 'get_miniprojects', lambda: ['toyproject'])
+  monkeypatch.setattr(grader, '_local_questions', {})
+  monkeypatch.setattr(grader, '_local_projects', set())
+  monkeypatch.setattr(grader, '_local_scorers', {})
+  CountingScorer.instances = 0
+  return project
+
+
+def test_local_score_scores_every_case(toy_project):
+  score = grader.local_score('toyproject__add', add)
+  assert list(score.case_scores) == [1, 1, 0]
+  assert score.score == pytest.approx(2. / 3)
+
+
+def test_local_score_reuses_questions_and_scorer(toy_project):
+  grader.local_score('toyproject__add', add)
+  grader.local_score('toyproject__add', add)
+  assert CountingScorer.instances == 1
+
+
+class RecordingSession(object):
+  def post(self, url, **kwargs):
+    self.url = url
+    self.kwargs = kwargs
+    return 'response'
+
+
+def test_session_is_shared_and_retries():
+  session = grader.get_session()
+  assert grader.get_session() is session
+  retries = session.get_adapter(grader.BASE_URL).max_retries
+  assert retries.total == grader.MAX_RETRIES
+  assert 503 in retries.status_forcelist
+
+
+def test_post_form_gzips_submissions(monkeypatch):
+  import gzip
+  import io
+  session = RecordingSession()
+  monkeypatch.setattr(grader, 'get_session', lambda: session)
+  monkeypatch.setattr(grader, 'COMPRESS_SUBMISSIONS', True)
+  assert grader._post_form('http://grader/submission', {'submission': 'x y'}) == 'response'
+  assert session.kwargs['headers']['Content-Encoding'] == 'gzip'
+  body = gzip.GzipFile(fileobj=io.BytesIO(session.kwargs['data'])).read()
+  assert body == b'submission=x+y'
+  assert session.kwargs['timeout'] == grader.REQUEST_TIMEOUT
+
+
+class FakeResponse(object):
+  def __init__(self, status_code, body=None, headers=None):
+    self.status_code = status_code
+    self.text = json.dumps(body)
+    self.headers = headers or {}
+
+
+class FakeGrader(object):
+  """ Serves test cases with an ETag, or fails if `online` is False. """
+
+  def __init__(self, test_cases):
+    self.test_cases = test_cases
+    self.etag = '"v1"'
+    self.online = True
+    self.requests = []
+
+  def get(self, url, headers=None, timeout=None):
+    self.requests.append(headers or {})
+    if not self.online:
+      raise grader.requests.exceptions.ConnectionError('offline')
+    if headers and headers.get('If-None-Match') == self.etag:
+      return FakeResponse(304)
+    return FakeResponse(200, self.test_cases, {'ETag': self.etag})
+
+
+@pytest.fixture
+def fake_grader(monkeypatch, tmpdir):
+  test_cases = [{'args': [list(range(2000))], 'kwargs': {'scale': 0.5},
+                 'type_str': 'number', 'answer': 1.5},
+                {'args': [[0.5] * 3], 'kwargs': {}, 'type_str': 'number', 'answer': 2}]
+  server = FakeGrader(test_cases)
+  monkeypatch.setattr(grader, 'get_session', lambda: server)
+  monkeypatch.setattr(grader, 'TEST_CASE_CACHE_DIR', str(tmpdir))
+  return server
+
+
+def test_test_cases_are_revalidated(fake_grader):
+  assert grader.get_test_cases('mp__q') == fake_grader.test_cases
+  assert fake_grader.requests[-1] == {}
+  cached = grader.get_test_cases('mp__q')
+  assert fake_grader.requests[-1] == {'If-None-Match': '"v1"'}
+  assert cached == fake_grader.test_cases
+  # The long list went through the .npz and comes back as a list of ints
+  assert type(cached[0]['args'][0]) is list
+  assert type(cached[0]['args'][0][0]) is int
+
+
+def test_cached_test_cases_are_only_read_when_current(fake_grader, monkeypatch):
+  reads = []
+  read_cache = grader._read_cache
+  monkeypatch.setattr(grader, '_read_cache',
+                      lambda *args: reads.append(args) or read_cache(*args))
+  grader.get_test_cases('mp__q')
+  grader.get_test_cases('mp__q')
+  assert len(reads) == 1
+
+  fake_grader.etag = '"v2"'
+  fake_grader.test_cases = fake_grader.test_cases[:1]
+  assert grader.get_test_cases('mp__q') == fake_grader.test_cases
+  assert len(reads) == 1
+  assert grader.get_test_cases('mp__q') == fake_grader.test_cases
+  assert fake_grader.requests[-1] == {'If-None-Match': '"v2"'}
+
+
+def test_unreadable_cache_is_downloaded_again(fake_grader):
+  grader.get_test_cases('mp__q')
+  _, json_path, _ = grader._cache_paths('mp__q')
+  with open(json_path, 'w') as f:
+    f.write('{"trunc')
+  assert grader.get_test_cases('mp__q') == fake_grader.test_cases
+  assert fake_grader.requests[-2:] == [{'If-None-Match': '"v1"'}, {}]
+
+
+def test_failed_cache_writes_leave_no_partial_files(fake_grader, monkeypatch, tmpdir):
+  grader.get_test_cases('mp__q')
+  files = sorted(tmpdir.listdir())
+
+  def disk_full(*args, **kwargs):
+    raise IOError('disk full')
+  rename = grader.os.rename
+  monkeypatch.setattr(grader.os, 'rename', disk_full)
+  fake_grader.etag = '"v2"'
+  assert grader.get_test_cases('mp__q') == fake_grader.test_cases
+  # Only the headers are gone, so the old test cases are never revalidated
+  assert sorted(tmpdir.listdir()) == [path for path in files
+                                      if not path.basename.endswith('.headers.json')]
+  monkeypatch.setattr(grader.os, 'rename', rename)
+  grader.get_test_cases('mp__q')
+  assert fake_grader.requests[-1] == {}
+
+
+def test_each_server_has_its_own_cache(fake_grader, monkeypatch):
+  grader.get_test_cases('mp__q')
+  monkeypatch.setattr(grader, 'BASE_URL', 'http://localhost:8080')
+  grader.get_test_cases('mp__q')
+  assert fake_grader.requests[-1] == {}
+  grader.get_test_cases('mp__q')
+  assert fake_grader.requests[-1] == {'If-None-Match': '"v1"'}
+
+
+def test_cached_test_cases_are_used_offline(fake_grader):
+  grader.get_test_cases('mp__q')
+  fake_grader.online = False
+  assert grader.get_test_cases('mp__q') == fake_grader.test_cases
+  with pytest.raises(grader.requests.exceptions.ConnectionError):
+    grader.get_test_cases('mp__other')
+
+
+def test_pack_keeps_mixed_lists_as_json():
+  arrays = {}
+  mixed = [1, 2.5] * 1000
+  assert grader._pack({'a': mixed}, arrays) == {'a': mixed}
+  assert arrays == {}
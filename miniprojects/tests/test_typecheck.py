@@ -0,0 +1,70 @@
+import jsonschema
+import numpy as np
+import pytest
+
+import typecheck
+
+DSHAPES = [
+    "number",
+    "string",
+    "count",
+    "3 * number",
+    "3 * count",
+    "2 * (string, count)",
+    "(number, string, 2 * count)",
+    "2 * 3 * count",
+    "2 * (number, count)",
+    '{"mean": "number", "counts": "2 * count"}',
+]
+
+INSTANCES = [
+    0, 3, -2, 1.5, float("nan"), float("inf"), True, None, "a", u"b",
+    [], [1, 2, 3], [1.0, 2, 3.5], [1, 2], [1, 2, 3, 4], (1, 2, 3), [1, "a", 3],
+    [True, 1, 2], [np.int32(1), 2, 3], [np.uint8(1), 2.5, 3], [2 ** 70, 1, 0],
+    np.arange(3), np.zeros(3), np.zeros(2),
+    [("a", 1), ("b", 2)], [["a", 1], ["b", -2]], [("a", 1)], [("a", 1.5), ("b", 2)],
+    (2.0, "x", [0, 1]), (2.0, "x", [0, -1]), [2.0, "x", (0, 1), 4],
+    {"mean": 1.5, "counts": [1, 2]}, {"mean": 1.5, "counts": [1, 2], "x": 1},
+    {"mean": 1.5}, {"mean": "1.5", "counts": [1, 2]},
+    np.arange(6).reshape(2, 3), -np.arange(6).reshape(2, 3), np.ones((2, 3)),
+    np.ones((3, 2), dtype=int), np.ones((2, 2)), np.array([1.5, np.nan, np.inf]),
+    np.array([[0.5, 1], [2.5, -1]]), np.array([True, False, True]),
+    np.arange(6, dtype=np.uint8).reshape(2, 3), np.arange(3, dtype=np.float32),
+]
+
+
+def draft4_validator(dshape):
+    schema = typecheck.dshape_to_schema(dshape)
+    return jsonschema.Draft4Validator(schema, types={"array": typecheck.ARRAY_TYPES})
+
+
+@pytest.mark.parametrize("dshape", DSHAPES)
+def test_verdicts_match_draft4(dshape):
+    reference = draft4_validator(dshape)
+    validator = typecheck.get_validator(dshape)
+    assert isinstance(validator, typecheck.CompiledValidator)
+    for instance in INSTANCES:
+        assert validator.is_valid(instance) == reference.is_valid(instance), instance
+
+
+def test_validate_raises_validation_error():
+    validator = typecheck.get_validator("2 * count")
+    validator.validate([0, 1])
+    with pytest.raises(jsonschema.ValidationError):
+        validator.validate([0, -1])
+
+
+def test_validators_are_memoized():
+    assert typecheck.get_validator("4 * number") is typecheck.get_validator("4 * number")
+
+
+def test_ndarray_fast_path():
+    schema = typecheck.dshape_to_schema("2 * 3 * count")
+    shape, leaves = typecheck._numeric_array_spec(schema)
+    assert shape == (2, 3)
+    check = typecheck.compile_ndarray_check(shape, leaves)
+    assert check(np.arange(6).reshape(2, 3))
+    assert not check(np.arange(6).reshape(3, 2))
+    assert not check(-np.arange(6).reshape(2, 3))
+    assert not check(np.ones((2, 3)))
+    assert typecheck._numeric_array_spec(typecheck.dshape_to_schema("2 * string")) is None
@@ -3,6 +3,7 @@ from __future__ import print_function
 
 import sys
 import json
+import numbers
 import pyparsing as pp
 import jsonschema
 import numpy as np
@@ -55,7 +56,181 @@ def dshape_to_schema(dshape):
         print("Bad dshape {}".format(dshape))
         raise e
 
+# Python types accepted for each JSON-schema type
+ARRAY_TYPES = (tuple, list, np.ndarray)
+
+# Compiled validators, keyed on the dshape string. The dshapes come from
+# the question definitions, so there are only ever a few of them.
+_validators = {}
+
+class UnsupportedSchema(Exception):
+    pass
+
+class CompiledValidator(object):
+    """ Validate instances against a schema built by `dshape_to_schema`.
+
+    The schema is compiled once into nested checker functions, which
+    return an error message (using jsonschema's wording) or None. Numeric
+    arrays submitted as ndarrays are checked with vectorized NumPy
+    operations.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self._check = compile_schema(schema)
+
+    def is_valid(self, instance):
+        return self._check(instance) is None
+
+    def validate(self, instance):
+        message = self._check(instance)
+        if message is not None:
+            raise jsonschema.ValidationError(message)
+
+def _type_message(instance, type_name):
+    return "%r is not of type %r" % (instance, type_name)
+
+def _numeric_array_spec(schema):
+    """ Return (shape, leaf schemas) if `schema` describes a numeric array.
+
+    This is the case for arrays of numbers (e.g. `N * M * count`) and arrays
+    of tuples of numbers (e.g. `N * (number, count)`), where the leaf
+    schemas correspond to the last axis. Otherwise return None.
+    """
+    shape = []
+    while schema.get("type") == "array" and isinstance(schema.get("items"), dict):
+        shape.append(schema["minItems"])
+        schema = schema["items"]
+    if schema.get("type") == "array":
+        leaves = schema["items"]
+        shape.append(len(leaves))
+    else:
+        leaves = [schema]
+    if not shape or any(leaf.get("type") not in ("number", "integer") for leaf in leaves):
+        return None
+    return tuple(shape), leaves
+
+def compile_ndarray_check(shape, leaves):
+    """ Return a vectorized check that an ndarray matches a numeric array spec.
+
+    The check only returns True or False; on False the element-wise checker
+    is used to find the same error message jsonschema would give.
+    """
+    if any(leaf["type"] == "integer" for leaf in leaves):
+        # Only dtypes whose scalars are Python ints (see `check_integer`)
+        dtype_ok = lambda dtype: issubclass(dtype.type, (int, long))
+    else:
+        dtype_ok = lambda dtype: dtype.kind in "iuf"
+    minimum = np.array([leaf.get("minimum", -np.inf) for leaf in leaves], dtype=float)
+    has_minimum = np.isfinite(minimum).any()
+
+    def check_ndarray(instance):
+        if instance.shape != shape or not dtype_ok(instance.dtype):
+            return False
+        # `minimum` broadcasts along the last axis (one entry per tuple item)
+        if has_minimum and not (instance >= minimum).all():
+            return False
+        return True
+    return check_ndarray
+
+def compile_schema(schema):
+    """ Return a checker function for a schema built by `dshape_to_schema`. """
+    schema_type = schema.get("type")
+    keys = set(schema) - {"type"}
+
+    if schema_type == "number" and not keys:
+        def check_number(instance):
+            if isinstance(instance, bool) or not isinstance(instance, numbers.Number):
+                return _type_message(instance, schema_type)
+        return check_number
+
+    if schema_type == "string" and not keys:
+        def check_string(instance):
+            if not isinstance(instance, basestring):
+                return _type_message(instance, schema_type)
+        return check_string
+
+    if schema_type == "integer" and keys <= {"minimum"}:
+        minimum = schema.get("minimum")
+        def check_integer(instance):
+            # Like jsonschema, only Python ints count (this includes
+            # np.int_, but not the other NumPy integer types)
+            if isinstance(instance, bool) or not isinstance(instance, (int, long)):
+                return _type_message(instance, schema_type)
+            if minimum is not None and instance < minimum:
+                return "%r is less than the minimum of %r" % (instance, minimum)
+        return check_integer
+
+    if schema_type == "array" and keys == {"items", "minItems", "maxItems"}:
+        min_items, max_items = schema["minItems"], schema["maxItems"]
+        items = schema["items"]
+        if isinstance(items, list):
+            item_checks = [compile_schema(item) for item in items]
+            def check_items(instance):
+                for check, item in zip(item_checks, instance):
+                    message = check(item)
+                    if message is not None:
+                        return message
+        else:
+            item_check = compile_schema(items)
+            def check_items(instance):
+                for item in instance:
+                    message = item_check(item)
+                    if message is not None:
+                        return message
+
+        spec = _numeric_array_spec(schema)
+        check_ndarray = compile_ndarray_check(*spec) if spec is not None else None
+
+        def check_array(instance):
+            if (check_ndarray is not None and isinstance(instance, np.ndarray)
+                    and check_ndarray(instance)):
+                return None
+            if not isinstance(instance, ARRAY_TYPES):
+                return _type_message(instance, schema_type)
+            if len(instance) < min_items:
+                return "%r is too short" % (instance,)
+            if len(instance) > max_items:
+                return "%r is too long" % (instance,)
+            return check_items(instance)
+        return check_array
+
+    if (schema_type == "object" and schema.get("additionalProperties") is False
+            and keys == {"properties", "required", "additionalProperties"}):
+        property_checks = {key: compile_schema(val)
+                           for key, val in schema["properties"].iteritems()}
+        required = list(schema["required"])
+        def check_object(instance):
+            if not isinstance(instance, dict):
+                return _type_message(instance, schema_type)
+            for key in required:
+                if key not in instance:
+                    return "%r is a required property" % (key,)
+            extras = [key for key in instance if key not in property_checks]
+            if extras:
+                verb = "was" if len(extras) == 1 else "were"
+                return "Additional properties are not allowed (%s %s unexpected)" % (
+                    ", ".join(repr(extra) for extra in extras), verb)
+            for key, check in property_checks.iteritems():
+                message = check(instance[key])
+                if message is not None:
+                    return message
+        return check_object
+
+    raise UnsupportedSchema(schema)
+
 def get_validator(type_str):
-    schema = dshape_to_schema(type_str)
-    types = {"array": (tuple, list, np.ndarray)}
-    return jsonschema.Draft4Validator(schema, types=types)
+    """ Return a (cached) validator for the dshape `type_str`.
+
+    Each dshape is only parsed and compiled once.
+    """
+    validator = _validators.get(type_str)
+    if validator is None:
+        schema = dshape_to_schema(type_str)
+        try:
+            validator = CompiledValidator(schema)
+        except UnsupportedSchema:
+            types = {"array": ARRAY_TYPES}
+            validator = jsonschema.Draft4Validator(schema, types=types)
+        _validators[type_str] = validator
+    return validator
@@ -0,0 +1,136 @@
+import numpy as np
+import tensorflow as tf
+
+
+class AdversarialNoiseBank(object):
+    """ Adversarial noise for every target class, trained in one batched run.
+
+    The bank holds one noise pattern per class, in a variable of shape
+    (n_classes, height, width, channels). Each pattern is added to every
+    image of the batch, and pattern k is trained to make the classifier
+    predict class k (the "hacked" labels are built on the graph), so one
+    `sess.run` takes a step for all targets. The noise is clipped to
+    [-noise_limit, noise_limit] by the training op itself.
+
+    :usage:
+        >>> bank = AdversarialNoiseBank(
+        ...     lambda images: conv_net(images, img_size, n_classes, stride, filt_size, out_sizes),
+        ...     x, (img_size, img_size, n_channels), n_classes, y_true=y_true)
+        >>> sess.run(bank.initializer)
+        >>> curves = bank.train(sess, lambda: data.train.next_batch(batch_size), n_steps)
+        >>> plt.plot(curves)
+
+    :parameters:
+        - model_fn : function
+            Takes images of shape (batch, height, width, channels) and
+            returns the logits. It is called with variable reuse turned
+            on, so it must create its variables under the same names as
+            when the classifier was trained (e.g. give each `tf.layers`
+            layer a `name`).
+        - x : tensor
+            The input images (flattened or not).
+        - img_shape : tuple
+            (height, width, channels) of an image.
+        - n_classes : int
+            Number of classes, and of noise patterns.
+        - y_true : tensor, optional
+            One-hot labels of `x`. If given, images that already are of
+            class k are left out of the fooling rate of target k.
+        - noise_limit : float
+            Largest absolute value of the noise.
+        - noise_l2_weight : float
+            Weight of the L2 penalty on each noise pattern.
+        - learning_rate : float
+            Learning rate of the Adam optimizer.
+    """
+
+    def __init__(self, model_fn, x, img_shape, n_classes, y_true=None,
+                 noise_limit=0.35, noise_l2_weight=0.02, learning_rate=0.001,
+                 name='adversarial_noise'):
+        self.x = x
+        self.y_true = y_true
+        self.n_classes = n_classes
+        img_shape = list(img_shape)
+        model_scope = tf.get_variable_scope()
+        existing_vars = set(tf.global_variables())
+
+        with tf.variable_scope(name):
+            self.noise = tf.Variable(tf.zeros([n_classes] + img_shape),
+                                     trainable=False, name='noise')
+            images = tf.reshape(x, [-1] + img_shape)
+            batch_size = tf.shape(images)[0]
+            # Add every pattern to every image: (n_classes * batch, ...)
+            noisy = tf.clip_by_value(images[tf.newaxis] + self.noise[:, tf.newaxis], 0.0, 1.0)
+            noisy = tf.reshape(noisy, [-1] + img_shape)
+            # Reuse the trained classifier's variables
+            with tf.variable_scope(model_scope, reuse=True):
+                logits = model_fn(noisy)
+            logits = tf.reshape(logits, [n_classes, batch_size, n_classes])
+
+            # Hacked labels: every image in slice k is labelled k
+            targets = tf.tile(tf.range(n_classes)[:, tf.newaxis], [1, batch_size])
+            cross_entropy = tf.nn.sparse_softmax_cross_entropy_with_logits(
+                labels=targets, logits=logits)
+            self.losses = (tf.reduce_mean(cross_entropy, axis=1) +
+                           noise_l2_weight * 0.5 * tf.reduce_sum(tf.square(self.noise),
+                                                                 axis=[1, 2, 3]))
+
+            fooled = tf.equal(tf.cast(tf.argmax(logits, 2), tf.int32), targets)
+            if y_true is None:
+                counted = tf.ones_like(targets, dtype=tf.float32)
+            else:
+                true_cls = tf.cast(tf.argmax(y_true, 1), tf.int32)
+                counted = tf.cast(tf.not_equal(targets, true_cls[tf.newaxis]), tf.float32)
+            # Per-class counts, so rates can be combined over batches
+            self._fooled = tf.reduce_sum(tf.cast(fooled, tf.float32) * counted, axis=1)
+            self._counted = tf.reduce_sum(counted, axis=1)
+            self.fooling_rates = self._fooled / tf.maximum(self._counted, 1.0)
+
+            # The patterns are independent, so the gradient of the summed
+            # losses with respect to pattern k is that of its own loss.
+            minimize = tf.train.AdamOptimizer(learning_rate).minimize(
+                tf.reduce_sum(self.losses), var_list=[self.noise])
+            with tf.control_dependencies([minimize]):
+                self.train_op = self.noise.assign(
+                    tf.clip_by_value(self.noise.read_value(), -noise_limit, noise_limit))
+
+        # The noise and the optimizer's variables
+        self.initializer = tf.variables_initializer(
+            [var for var in tf.global_variables() if var not in existing_vars])
+
+    def _feed(self, x_batch, y_batch, feed_dict):
+        feed_dict = dict(feed_dict or {})
+        feed_dict[self.x] = x_batch
+        if self.y_true is not None:
+            feed_dict[self.y_true] = y_batch
+        return feed_dict
+
+    def train(self, sess, next_batch, num_iterations, feed_dict=None):
+        """ Train all noise patterns for `num_iterations` steps.
+
+        `next_batch` is called without arguments and returns an
+        (images, labels) batch. Returns the fooling rate of every target
+        class on each training batch, before the step, as an array of
+        shape (num_iterations, n_classes).
+        """
+        curves = np.empty((num_iterations, self.n_classes))
+        for i in xrange(num_iterations):
+            x_batch, y_batch = next_batch()
+            _, curves[i] = sess.run([self.train_op, self.fooling_rates],
+                                    feed_dict=self._feed(x_batch, y_batch, feed_dict))
+        return curves
+
+    def evaluate(self, sess, images, labels=None, batch_size=100, feed_dict=None):
+        """ Return the fooling rate of every target class on `images`.
+
+        Each run evaluates `batch_size` * n_classes noisy images.
+        """
+        fooled = np.zeros(self.n_classes)
+        counted = np.zeros(self.n_classes)
+        for start in xrange(0, len(images), batch_size):
+            batch = slice(start, start + batch_size)
+            f, c = sess.run([self._fooled, self._counted], feed_dict=self._feed(
+                images[batch], None if labels is None else labels[batch], feed_dict))
+            fooled += f
+            counted += c
+        return fooled / np.maximum(counted, 1)
@@ -1,10 +1,16 @@
 import numpy as np
+from numpy.lib.stride_tricks import as_strided
 from scipy.ndimage import convolve
 from skimage import color
 from ipywidgets import IntSlider
 from IPython.html import widgets
 import matplotlib.pyplot as plt
 
+from pylib.lru import LRUCache
+
+# Default memory budget for cached kernel overlays (bytes).
+DEFAULT_CACHE_BYTES = 32 * 2**20
+
 class ConvWidget:
     
     @classmethod
@@ -40,7 +46,9 @@ class ConvWidget:
     @classmethod
     def add_padding(cls, image, kernel):
         h_pad, w_pad = cls.padding_for_kernel(kernel)
-        return np.pad(image, ((h_pad, h_pad), (w_pad, w_pad)),
+        # Don't pad RGB channels if they exist.
+        channels = [(0, 0)] * (image.ndim - 2)
+        return np.pad(image, [(h_pad, h_pad), (w_pad, w_pad)] + channels,
                       mode='constant', constant_values=0)
     
     @classmethod
@@ -64,6 +72,69 @@ class ConvWidget:
         # An element-wise multiplication followed by the sum
         return np.sum(kernel * image_patch)
     
+    @classmethod
+    def sliding_windows(cls, image, kernel):
+        """ Return a view of every kernel-sized patch of a padded image.
+
+        The result has shape (height, width, k_height, k_width), followed by
+        any RGB channels, where (height, width) is the size of the image
+        before padding. Patches share memory with `image`; nothing is copied.
+        """
+        k_height, k_width = kernel.shape[:2]
+        height = image.shape[0] - k_height + 1
+        width = image.shape[1] - k_width + 1
+        row_stride, col_stride = image.strides[:2]
+        windows = as_strided(image,
+                             shape=(height, width, k_height, k_width) + image.shape[2:],
+                             strides=(row_stride, col_stride,
+                                      row_stride, col_stride) + image.strides[2:])
+        # Neighbouring windows overlap, so writing to one would change others.
+        windows.flags.writeable = False
+        return windows
+
+    @classmethod
+    def filter_image_bank(cls, image, kernels):
+        """ Return the image filtered by each kernel in `kernels`.
+
+        All kernels must have the same shape. The result is stacked along a
+        new leading axis, so it has shape (n_kernels,) + image.shape. Each
+        filtered image matches calling `apply_kernel` at every pixel, but is
+        computed for the whole image (and every RGB channel) in one pass.
+        """
+        kernels = np.asarray(kernels, dtype=float)
+        image = cls.add_padding(np.asarray(image, dtype=float), kernels[0])
+        windows = cls.sliding_windows(image, kernels[0])
+        # Multiply each window by each kernel and sum over the kernel axes.
+        return np.einsum('hwij...,kij->khw...', windows, kernels)
+
+    @classmethod
+    def filter_image(cls, image, kernel):
+        """ Return the image filtered by `kernel`, computed in one pass. """
+        return cls.filter_image_bank(image, [kernel])[0]
+
+    @classmethod
+    def reveal_pixels(cls, filtered, n_pixels):
+        """ Return a copy of `filtered` where only the first pixels are set.
+
+        Pixels are counted in the same order as `iter_pixels`; every pixel
+        after the first `n_pixels` is NaN.
+        """
+        height, width = filtered.shape[:2]
+        partial = np.full(filtered.shape, np.nan)
+        flat_shape = (height * width,) + filtered.shape[2:]
+        partial.reshape(flat_shape)[:n_pixels] = filtered.reshape(flat_shape)[:n_pixels]
+        return partial
+
+    @classmethod
+    def kernel_labels(cls, center, image, kernel):
+        """ Return the kernel label-image for a kernel centered at `center`.
+
+        `image` and `center` are both in padded coordinates.
+        """
+        mask = np.zeros(image.shape[:2], dtype=int)  # Background = 0
+        mask[cls.window_slice(center, kernel)] = 1   # Kernel = 1
+        return mask
+
     @classmethod
     def iter_kernel_labels(cls, image, kernel):
         """ Yield position and kernel labels for each pixel in the image.
@@ -81,9 +152,7 @@ class ConvWidget:
             # Shift the center of the kernel to ignore padded border.
             i += i_pad
             j += j_pad
-            mask = np.zeros(image.shape, dtype=int)  # Background = 0
-            mask[cls.window_slice((i, j), kernel)] = 1   # Kernel = 1
-            yield (i, j), mask
+            yield (i, j), cls.kernel_labels((i, j), image, kernel)
     
     @classmethod
     def visualize_kernel(cls, kernel_labels, image):
@@ -95,50 +164,20 @@ class ConvWidget:
                                colors=('yellow', 'red'))
     
     @classmethod
-    def make_convolution_step_function(cls, image, kernel, **kwargs):
-        # Initialize generator since we're only ever going to iterate over
-        # a pixel once. The cached result is used, if we step back.
-        gen_kernel_labels = cls.iter_kernel_labels(image, kernel)
+    def make_convolution_step_function(cls, image, kernel,
+                                       max_cache_bytes=DEFAULT_CACHE_BYTES,
+                                       **kwargs):
+        # Frames are built on demand from the final filtered image, so any
+        # step can be plotted without visiting the ones before it.
+        frames = ConvFrameStore(image, kernel, widget=cls,
+                                max_cache_bytes=max_cache_bytes)
         stride = image.shape[1]
-        print stride
-
-        image_cache = []
-        image = cls.add_padding(image, kernel)
 
         def convolution_step(i_step):
             """ Plot original image and kernel-overlay next to filtered image.
-
-            For a given step, check if it's in the image cache. If not
-            calculate all necessary images, then plot the requested step.
             """
-
-            # Create all images up to the current step, unless they're already
-            # cached:
-            
-            while i_step >= len(image_cache):
-
-                # For the first step (`i_step == 0`), the original image is
-                # full of NaNs; after that we look in the cache, which stores
-                # (`kernel_overlay`, `filtered`).
-                filtered_prev = np.full_like(image, np.nan) if i_step == 0 else image_cache[-1][1]
-                # We don't want to overwrite the previously filtered image:
-                filtered = filtered_prev.copy()
-
-                # Get the labels used to visualize the kernel
-                center, kernel_labels = gen_kernel_labels.next()
-                # Modify the pixel value at the kernel center
-                filtered[center] = cls.apply_kernel(center, kernel, image)
-                # Take the original image and overlay our kernel visualization
-                kernel_overlay = cls.visualize_kernel(kernel_labels, image)
-                # Save images for reuse.
-                image_cache.append((kernel_overlay, filtered))
-
-            # Remove padding we added to deal with boundary conditions
-            # (Loop since each step has 2 images)
-            image_pair = [cls.remove_padding(each, kernel)
-                          for each in image_cache[i_step]]
-            cls.imshow_pair(image_pair, cmap='gray', **kwargs)
-            center = (i_step / stride, i_step % stride)
+            cls.imshow_pair(frames[i_step], cmap='gray', **kwargs)
+            center = divmod(i_step, stride)
             plt.sca(plt.gcf().axes[0])
             plt.plot([center[1]], [center[0]], 'ro')
             plt.show()
@@ -146,7 +185,144 @@ class ConvWidget:
         return convolution_step  # <-- this is a function
     
     @classmethod
-    def interactive_convolution_demo(cls, image, kernel, **kwargs):
-        stepper = cls.make_convolution_step_function(image, kernel, **kwargs)
-        step_slider = IntSlider(min=0, max=image.size-1, value=0)
-        widgets.interact(stepper, i_step=step_slider)
\ No newline at end of file
+    def make_incremental_step_function(cls, image, kernel, titles=('', ''),
+                                       figsize=(10, 5), **kwargs):
+        """ Return a step function that updates one persistent figure.
+
+        The figure and its image artists are created once. Each step only
+        updates the filtered pixels that changed since the previous step and
+        moves the kernel rectangle, then blits those artists. This needs an
+        interactive backend (e.g. `%matplotlib notebook`) to be redrawn.
+        """
+        final = cls.filter_image(image, kernel)
+        height, width = final.shape[:2]
+        k_height, k_width = kernel.shape[:2]
+        i_pad, j_pad = cls.padding_for_kernel(kernel)
+
+        # Filtered pixels shown so far; updated in place as the slider moves.
+        shown = np.full(final.shape, np.nan)
+        flat_shown = shown.reshape((height * width,) + final.shape[2:])
+        flat_final = final.reshape(flat_shown.shape)
+
+        # Fix the color scale, since `shown` starts out as all NaNs.
+        filtered_kwargs = dict(vmin=final.min(), vmax=final.max())
+        filtered_kwargs.update(kwargs)
+
+        fig, (ax_image, ax_filtered) = plt.subplots(ncols=2, figsize=figsize)
+        ax_image.imshow(image, cmap='gray', **kwargs)
+        ax_image.set_title(titles[0])
+        filtered_artist = ax_filtered.imshow(shown, cmap='gray', animated=True,
+                                             **filtered_kwargs)
+        ax_filtered.set_title(titles[1])
+        # Outline of the kernel (pixel centers are at integer coordinates).
+        rectangle = plt.Rectangle((-j_pad - 0.5, -i_pad - 0.5), k_width, k_height,
+                                  fill=False, ec='yellow', lw=2, animated=True)
+        ax_image.add_patch(rectangle)
+        marker, = ax_image.plot([0], [0], 'ro', animated=True)
+        # Don't let the kernel rectangle stretch the axes past the image.
+        ax_image.set_xlim(-0.5, width - 0.5)
+        ax_image.set_ylim(height - 0.5, -0.5)
+
+        canvas = fig.canvas
+        animated = [filtered_artist, rectangle, marker]
+        state = {'step': -1, 'background': None}
+
+        def draw_animated():
+            for artist in animated:
+                artist.axes.draw_artist(artist)
+
+        def on_draw(event):
+            # Full redraws (first show, resize) refresh the static background.
+            state['background'] = canvas.copy_from_bbox(fig.bbox)
+            draw_animated()
+
+        canvas.mpl_connect('draw_event', on_draw)
+
+        def convolution_step(i_step):
+            """ Update the figure to show the convolution at `i_step`. """
+            last = state['step']
+            if i_step > last:
+                flat_shown[last+1:i_step+1] = flat_final[last+1:i_step+1]
+            else:
+                flat_shown[i_step+1:last+1] = np.nan
+            state['step'] = i_step
+
+            i, j = divmod(i_step, width)
+            filtered_artist.set_data(shown)
+            rectangle.set_xy((j - j_pad - 0.5, i - i_pad - 0.5))
+            marker.set_data([j], [i])
+
+            if state['background'] is None or not getattr(canvas, 'supports_blit', False):
+                canvas.draw_idle()
+            else:
+                canvas.restore_region(state['background'])
+                draw_animated()
+                canvas.blit(fig.bbox)
+
+        plt.show()
+        return convolution_step  # <-- this is a function
+    
+    @classmethod
+    def interactive_convolution_demo(cls, image, kernel, incremental=False, **kwargs):
+        """ Show a slider that steps the kernel across the image.
+
+        With `incremental=True`, a single figure is updated in place on each
+        step instead of drawing a new figure (see
+        `make_incremental_step_function`).
+        """
+        if incremental:
+            make_stepper = cls.make_incremental_step_function
+        else:
+            make_stepper = cls.make_convolution_step_function
+        stepper = make_stepper(image, kernel, **kwargs)
+        height, width = image.shape[:2]
+        step_slider = IntSlider(min=0, max=height*width-1, value=0)
+        widgets.interact(stepper, i_step=step_slider)
+
+
+class ConvFrameStore(object):
+    """ Lazily built (kernel_overlay, filtered) frames of a convolution demo.
+
+    Only the final filtered image is kept in full. Frame `i` is built on
+    demand by masking that result to its first `i + 1` pixels, so jumping
+    to any step costs the same. Rendered kernel overlays are kept in a
+    least-recently-used cache that holds at most `max_cache_bytes`.
+    """
+
+    def __init__(self, image, kernel, widget=ConvWidget,
+                 max_cache_bytes=DEFAULT_CACHE_BYTES):
+        self.widget = widget
+        self.kernel = kernel
+        self.final = widget.filter_image(image, kernel)
+        self.padded = widget.add_padding(image, kernel)
+        self._overlays = LRUCache(max_cache_bytes, sizeof=lambda overlay: overlay.nbytes)
+
+    def __len__(self):
+        height, width = self.final.shape[:2]
+        return height * width
+
+    def __getitem__(self, i_step):
+        return self.kernel_overlay(i_step), self.filtered(i_step)
+
+    def filtered(self, i_step):
+        """ Return the filtered image after the kernel visited `i_step`. """
+        return self.widget.reveal_pixels(self.final, i_step + 1)
+
+    def kernel_overlay(self, i_step):
+        """ Return the original image with the kernel at `i_step` overlaid. """
+        overlay = self._overlays.get(i_step)
+        if overlay is None:
+            overlay = self._render_overlay(i_step)
+            self._overlays.put(i_step, overlay)
+        return overlay
+
+    def _render_overlay(self, i_step):
+        widget = self.widget
+        i_pad, j_pad = widget.padding_for_kernel(self.kernel)
+        # Kernel center for this step, shifted to ignore padded border.
+        i, j = divmod(i_step, self.final.shape[1])
+        center = (i + i_pad, j + j_pad)
+        kernel_labels = widget.kernel_labels(center, self.padded, self.kernel)
+        overlay = widget.visualize_kernel(kernel_labels, self.padded)
+        # Remove padding we added to deal with boundary conditions
+        return widget.remove_padding(overlay, self.kernel)
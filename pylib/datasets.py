@@ -0,0 +1,206 @@
+import os
+import shutil
+import tempfile
+import cPickle as pickle
+
+import numpy as np
+
+from pylib.sequence_batcher import encode_text
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'small_data')
+HOUSING_PATH = os.path.join(DATA_DIR, 'housing.pkl')
+STRATA_PATH = os.path.join(DATA_DIR, 'strata_abstracts.txt')
+
+# Bump when the cache layout changes, so old caches are rebuilt
+CACHE_VERSION = 1
+META_FILE = 'meta.npz'
+
+
+def shuffle_split(n_samples, test_size=0.2, random_state=42):
+    """ Return (train, test) indices, the same as the single split of
+    `sklearn.model_selection.ShuffleSplit(1, test_size, random_state)`.
+    """
+    n_test = int(np.ceil(test_size * n_samples))
+    permutation = np.random.RandomState(random_state).permutation(n_samples)
+    return permutation[n_test:], permutation[:n_test]
+
+
+def default_cache_dir(source):
+    """ The cache of `source` is a directory next to it, without the extension. """
+    return os.path.splitext(source)[0]
+
+
+def _source_stamp(source):
+    stat = os.stat(source)
+    return np.array([stat.st_mtime, stat.st_size])
+
+
+def _read_meta(cache_dir):
+    try:
+        with np.load(os.path.join(cache_dir, META_FILE)) as npz:
+            return dict(npz)
+    except (IOError, ValueError):
+        return None
+
+
+def _is_current(meta, source, options):
+    """ Whether a cache with `meta` was built from `source` with `options`. """
+    if meta is None or meta.get('version') != CACHE_VERSION:
+        return False
+    if source is not None and not np.array_equal(meta.get('source_stamp'),
+                                                 _source_stamp(source)):
+        return False
+    return all(key in meta and meta[key] == value for key, value in options.items())
+
+
+def _write_cache(cache_dir, arrays, meta):
+    """ Write each of `arrays` to its own .npy file (so it can be memory-mapped)
+    and `meta` to META_FILE. The directory is replaced in one rename, so a
+    half-written cache is never read.
+    """
+    parent = os.path.dirname(os.path.abspath(cache_dir))
+    if not os.path.isdir(parent):
+        os.makedirs(parent)
+    tmp_dir = tempfile.mkdtemp(dir=parent)
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, name + '.npy'), array)
+        meta = dict(meta, version=CACHE_VERSION)
+        np.savez(os.path.join(tmp_dir, META_FILE), **meta)
+        if os.path.isdir(cache_dir):
+            shutil.rmtree(cache_dir)
+        os.rename(tmp_dir, cache_dir)
+    except:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def _load_pickle(path):
+    try:
+        import dill as pickler
+    except ImportError:
+        pickler = pickle
+    with open(path, 'rb') as f:
+        return pickler.load(f)
+
+
+class TabularDataset(object):
+    """ A (data, target) dataset with a fixed train/test split, stored as .npy files.
+
+    The rows are stored with the training rows first, so `X_train`,
+    `X_test`, `y_train` and `y_test` are slices of memory-mapped arrays:
+    opening a dataset reads no data at all. The split indices into the
+    original rows and the training-set mean and standard deviation are
+    stored with it.
+
+    :usage:
+        >>> housing = load_housing()
+        >>> X_train, y_train, X_test, y_test = housing.split()
+        >>> Xs_train, _, Xs_test, _ = housing.split(standardize=True)
+    """
+
+    def __init__(self, cache_dir, mmap_mode='r'):
+        meta = _read_meta(cache_dir)
+        if meta is None:
+            raise IOError("no dataset cache in %s" % cache_dir)
+        self.cache_dir = cache_dir
+        self.data = np.load(os.path.join(cache_dir, 'data.npy'), mmap_mode=mmap_mode)
+        self.target = np.load(os.path.join(cache_dir, 'target.npy'), mmap_mode=mmap_mode)
+        self.train_index = meta['train_index']
+        self.test_index = meta['test_index']
+        self.mean = meta['mean']
+        self.std = meta['std']
+        self.n_train = len(self.train_index)
+
+    @property
+    def X_train(self):
+        return self.data[:self.n_train]
+
+    @property
+    def X_test(self):
+        return self.data[self.n_train:]
+
+    @property
+    def y_train(self):
+        return self.target[:self.n_train]
+
+    @property
+    def y_test(self):
+        return self.target[self.n_train:]
+
+    def standardize(self, X):
+        """ Scale `X` with the training-set statistics. """
+        return (X - self.mean) / self.std
+
+    def split(self, standardize=False):
+        """ Return (X_train, y_train, X_test, y_test).
+
+        The arrays are memory-mapped, unless `standardize` is set (then
+        the standardized X arrays are computed in memory).
+        """
+        X_train, X_test = self.X_train, self.X_test
+        if standardize:
+            X_train, X_test = self.standardize(X_train), self.standardize(X_test)
+        return X_train, self.y_train, X_test, self.y_test
+
+
+def convert_tabular(data, target, cache_dir, test_size=0.2, random_state=42,
+                    source=None):
+    """ Store `data` and `target` as a TabularDataset in `cache_dir`.
+
+    The split is that of `ShuffleSplit(1, test_size, random_state)`, and the
+    mean and standard deviation are computed on the training rows.
+    """
+    data, target = np.asarray(data), np.asarray(target)
+    train, test = shuffle_split(len(data), test_size, random_state)
+    order = np.concatenate([train, test])
+    meta = {'train_index': train, 'test_index': test,
+            'mean': data[train].mean(axis=0), 'std': data[train].std(axis=0),
+            'test_size': test_size, 'random_state': random_state}
+    if source is not None:
+        meta['source_stamp'] = _source_stamp(source)
+    _write_cache(cache_dir, {'data': data[order], 'target': target[order]}, meta)
+
+
+def load_tabular(source, cache_dir=None, test_size=0.2, random_state=42,
+                 mmap_mode='r'):
+    """ Open the TabularDataset for the pickle `source`, converting it if needed.
+
+    `source` holds an object with `data` and `target` arrays (such as a
+    scikit-learn Bunch, pickled with pickle or dill). It is only unpickled
+    when there is no cache yet, or when it changed since the cache was built.
+    """
+    cache_dir = cache_dir or default_cache_dir(source)
+    options = {'test_size': test_size, 'random_state': random_state}
+    if not _is_current(_read_meta(cache_dir), source, options):
+        bunch = _load_pickle(source)
+        convert_tabular(bunch.data, bunch.target, cache_dir, source=source, **options)
+    return TabularDataset(cache_dir, mmap_mode)
+
+
+def load_housing(**kwargs):
+    """ The Boston housing data of small_data/housing.pkl, as a TabularDataset. """
+    return load_tabular(HOUSING_PATH, **kwargs)
+
+
+def load_text(source, cache_dir=None, lower=False, mmap_mode='r'):
+    """ Return (data, chars) for the text file `source`, as by `encode_text`.
+
+    The encoded text is cached as a .npy file and returned memory-mapped,
+    so the text is only read and encoded when the cache is missing or
+    out of date.
+    """
+    cache_dir = cache_dir or default_cache_dir(source)
+    if not _is_current(_read_meta(cache_dir), source, {'lower': lower}):
+        with open(source, 'rb') as f:
+            text = f.read()
+        if lower:
+            text = text.lower()
+        data, chars = encode_text(text)
+        _write_cache(cache_dir, {'data': data},
+                     {'chars': np.array(chars), 'lower': lower,
+                      'source_stamp': _source_stamp(source)})
+    data = np.load(os.path.join(cache_dir, 'data.npy'), mmap_mode=mmap_mode)
+    return data, _read_meta(cache_dir)['chars'].tolist()
@@ -0,0 +1,128 @@
+import numpy as np
+import tensorflow as tf
+
+
+class DeepDream(object):
+    """ Deep Dream on an imported image-classification graph.
+
+    The gradient op of each target layer is built once and cached, so
+    dreaming again (or on another image) adds nothing to the graph.
+    Gradients are computed on fixed-size tiles of the image, after a
+    random shift, so memory use per `session.run` is bounded by
+    `tiles_per_run` tiles whatever the image size; the random shift
+    hides the tile seams. `dream` runs the optimization on a pyramid of
+    octaves, from a downscaled image up to full resolution.
+
+    :usage:
+        >>> dreamer = DeepDream(graph, graph_input, session)
+        >>> result = dreamer.dream('mixed4a', image, num_octaves=4)
+        >>> display(PIL.Image.fromarray(result))
+
+    :parameters:
+        - graph : tf.Graph
+            The graph holding the network (e.g. the imported Inception 5h).
+        - graph_input : tensor
+            The image input, of shape (batch, height, width, 3).
+        - session : tf.Session, optional
+            Session on `graph` (default: a new one).
+        - tile_size : int
+            Height and width of the tiles (smaller images use one tile).
+        - tiles_per_run : int
+            Number of tiles whose gradients are computed per `session.run`.
+        - seed : int, optional
+            Seed of the random tile shifts.
+    """
+
+    def __init__(self, graph, graph_input, session=None, tile_size=400,
+                 tiles_per_run=4, seed=None):
+        self.graph = graph
+        self.graph_input = graph_input
+        self.session = session or tf.Session(graph=graph)
+        self.tile_size = tile_size
+        self.tiles_per_run = tiles_per_run
+        self.rng = np.random.RandomState(seed)
+        self._gradients = {}
+
+        with graph.as_default(), tf.name_scope('deep_dream'):
+            self._resize_image = tf.placeholder(tf.float32, [None, None, 3], name='image')
+            self._resize_shape = tf.placeholder(tf.int32, [2], name='shape')
+            self._resized = tf.image.resize_bilinear(
+                self._resize_image[tf.newaxis], self._resize_shape)[0]
+
+    def gradient(self, layer):
+        """ Return the gradient of the mean squared activation of `layer`
+        (a tensor or a layer name) with respect to the input image.
+        """
+        if not isinstance(layer, tf.Tensor):
+            layer = self.graph.get_tensor_by_name(layer + ':0')
+        if layer.name not in self._gradients:
+            with self.graph.as_default(), tf.name_scope('deep_dream'):
+                self._gradients[layer.name] = tf.gradients(
+                    tf.reduce_mean(tf.square(layer)), self.graph_input)[0]
+        return self._gradients[layer.name]
+
+    def resize(self, image, shape):
+        """ Bilinearly resize a (height, width, 3) image to `shape`. """
+        return self.session.run(self._resized, feed_dict={self._resize_image: image,
+                                                          self._resize_shape: shape})
+
+    def tiled_gradient(self, gradient, image):
+        """ Return the gradient of `image`, computed tile by tile.
+
+        The image is rolled by a random offset and wrapped around to a
+        whole number of tiles, so all tiles have the same shape and can
+        be stacked. Each tile's gradient is normalized by its own
+        standard deviation.
+        """
+        height, width = image.shape[:2]
+        tile_h, tile_w = min(self.tile_size, height), min(self.tile_size, width)
+        shift_h, shift_w = self.rng.randint(tile_h), self.rng.randint(tile_w)
+        rolled = np.roll(np.roll(image, shift_h, axis=0), shift_w, axis=1)
+        n_h, n_w = -(-height // tile_h), -(-width // tile_w)
+        padded = np.pad(rolled, [(0, n_h * tile_h - height), (0, n_w * tile_w - width), (0, 0)],
+                        mode='wrap')
+
+        tiles = padded.reshape(n_h, tile_h, n_w, tile_w, 3).swapaxes(1, 2)
+        tiles = tiles.reshape(n_h * n_w, tile_h, tile_w, 3)
+        grads = np.empty_like(tiles)
+        for start in xrange(0, len(tiles), self.tiles_per_run):
+            batch = slice(start, start + self.tiles_per_run)
+            grad = self.session.run(gradient, feed_dict={self.graph_input: tiles[batch]})
+            grads[batch] = grad / (grad.std(axis=(1, 2, 3), keepdims=True) + 1e-8)
+
+        grads = grads.reshape(n_h, n_w, tile_h, tile_w, 3).swapaxes(1, 2)
+        grads = grads.reshape(n_h * tile_h, n_w * tile_w, 3)[:height, :width]
+        return np.roll(np.roll(grads, -shift_h, axis=0), -shift_w, axis=1)
+
+    def optimize(self, layer, image, num_iterations=10, step_size=3.0):
+        """ Follow the tiled gradient of `layer` for `num_iterations` steps
+        at the image's own scale. Returns a float32 image.
+        """
+        gradient = self.gradient(layer)
+        image = np.array(image, dtype=np.float32)
+        for _ in xrange(num_iterations):
+            image += step_size * self.tiled_gradient(gradient, image)
+        return image
+
+    def dream(self, layer, image, num_octaves=4, octave_scale=1.4,
+              num_iterations=10, step_size=3.0):
+        """ Run Deep Dream on `image` at `num_octaves` scales, returning a uint8 image.
+
+        The image is repeatedly downscaled by `octave_scale`, keeping the
+        detail lost at each step. Starting from the smallest image, each
+        octave is optimized, upscaled, and has its detail added back.
+        """
+        image = np.asarray(image, dtype=np.float32)
+        details = []
+        for _ in xrange(num_octaves - 1):
+            shape = image.shape[:2]
+            smaller = self.resize(image, np.int32(np.round(np.divide(shape, octave_scale))))
+            details.append(image - self.resize(smaller, shape))
+            image = smaller
+
+        for octave in xrange(num_octaves):
+            if octave > 0:
+                detail = details.pop()
+                image = self.resize(image, detail.shape[:2]) + detail
+            image = self.optimize(layer, image, num_iterations, step_size)
+        return np.clip(image, 0, 255).astype(np.uint8)
@@ -1,8 +1,25 @@
 # coding=utf-8
 
+from multiprocessing.pool import ThreadPool
+import hashlib
+import os
+import tempfile
+import threading
+
 from IPython import display
 import pydot
 
+from pylib.lru import LRUCache
+
+# Rendered images, keyed on (hash of the DOT source, output format).
+RENDER_CACHE_SIZE = 64
+_render_cache = LRUCache(RENDER_CACHE_SIZE)
+_render_cache_lock = threading.Lock()
+
+# Directory where rendered images are also stored between sessions.
+# Set to None to only cache in memory.
+CACHE_DIR = os.environ.get('DRAW_GRAPH_CACHE_DIR')
+
 graphs = {
     # Intro to TF notebook
     "add-op": """
@@ -182,7 +199,59 @@ graphs = {
         }""",
 }
 
-def draw_graph(name):
-    graph = graphs.get(name, name)
-    return display.Image(pydot.graph_from_dot_data(graph).create_png())
-    
\ No newline at end of file
+def render(source, fmt='png'):
+    """ Return the Graphviz rendering of a DOT source as a byte string.
+
+    Renderings are cached in memory (and in CACHE_DIR, if set), keyed on
+    the hash of the source and the format, so `dot` only runs once per graph.
+    """
+    if isinstance(source, type(u'')):
+        source = source.encode('utf-8')
+    key = (hashlib.sha1(source).hexdigest(), fmt)
+
+    with _render_cache_lock:
+        data = _render_cache.get(key)
+    if data is None:
+        path = None if CACHE_DIR is None else os.path.join(CACHE_DIR, '%s.%s' % key)
+        if path is not None and os.path.exists(path):
+            with open(path, 'rb') as f:
+                data = f.read()
+        else:
+            data = pydot.graph_from_dot_data(source).create(format=fmt)
+            if path is not None:
+                _write_atomic(path, data)
+        with _render_cache_lock:
+            _render_cache.put(key, data)
+    return data
+
+def _write_atomic(path, data):
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory)
+    except OSError:
+        if not os.path.isdir(directory):
+            raise
+    # Write to a temporary file first so readers never see a partial image.
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.rename(tmp_path, path)
+
+def prerender(names=None, fmt='png', processes=4):
+    """ Render the named graphs (default: all of `graphs`) into the cache.
+
+    `dot` is run for up to `processes` graphs at a time.
+    """
+    if names is None:
+        names = graphs.keys()
+    pool = ThreadPool(processes)
+    try:
+        pool.map(lambda name: render(graphs.get(name, name), fmt), names)
+    finally:
+        pool.close()
+
+def draw_graph(name, fmt='png'):
+    data = render(graphs.get(name, name), fmt)
+    if fmt == 'svg':
+        return display.SVG(data)
+    return display.Image(data, format=fmt)
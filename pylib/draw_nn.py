@@ -1,103 +1,217 @@
+# coding=utf-8
+
+from collections import namedtuple
+
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection, PatchCollection, PolyCollection
 import numpy as np
-import random
+
+from pylib.lru import LRUCache
+
+
+# Layouts computed with a fixed seed, keyed on the arguments that built them.
+_LAYOUT_CACHE = LRUCache(32)
+
+Layout = namedtuple('Layout', ['v_spacing', 'squares', 'shades', 'circles',
+                               'circle_colors', 'triangles', 'edges',
+                               'bundles', 'ellipses'])
 
 
-def draw_neural_net(ax, layer_sizes, *args):
+def draw_neural_net(ax, layer_sizes, p=None, max_nodes=None, max_edges=None,
+                    seed=None):
     '''
     Draw a neural network cartoon using matplotilb.
     This function is adapted from https://gist.github.com/craffel/2d727968c3aaebd10359
-    
+
     :usage:
         >>> fig = plt.figure(figsize=(12, 12))
         >>> draw_neural_net(fig.gca(), [4, 7, 2], p)
-    
+        >>> draw_neural_net(fig.gca(), [784, 256, 10], max_nodes=10, max_edges=500)
+
     :parameters:
         - ax : matplotlib.axes.AxesSubplot
             The axes on which to plot the cartoon (get e.g. by plt.gca())
         - layer_sizes : list of int
             List of layer sizes, including input and output dimensionality
         - p : percentage of neurons to be dropped in each hidden layer
+        - max_nodes : int, optional
+            Draw at most this many nodes per layer, counting the ellipsis
+            (at least 3); wider layers show their first and last nodes with
+            an ellipsis in between
+        - max_edges : int, optional
+            Draw a single shaded bundle instead of the individual edges
+            between two layers when there are more than this many
+        - seed : int, optional
+            Seed for the input shades and dropout masks (default: use the
+            global `np.random` state). Layouts with a seed are cached, so
+            redrawing the same network is instant.
     '''
-    
+    layout = get_layout(layer_sizes, p, max_nodes, max_edges, seed)
+    v_spacing = layout.v_spacing
+
+    # Nodes
+    ax.add_collection(PolyCollection(layout.squares,
+                                     facecolors=np.column_stack([layout.shades]*3),
+                                     edgecolors='k', zorder=4),
+                      autolim=False)
+    circles = [plt.Circle(center, v_spacing/4.) for center in layout.circles]
+    if circles:
+        ax.add_collection(PatchCollection(circles, facecolors=layout.circle_colors,
+                                          edgecolors='k', zorder=4),
+                          autolim=False)
+    ax.add_collection(PolyCollection(layout.triangles, facecolors='#fc8d59',
+                                     edgecolors='k', zorder=4),
+                      autolim=False)
+
+    # Edges
+    ax.add_collection(LineCollection(layout.edges, colors='k'), autolim=False)
+    if len(layout.bundles):
+        ax.add_collection(PolyCollection(layout.bundles, facecolors='k',
+                                         edgecolors='none', alpha=.3),
+                          autolim=False)
+
+    # Skipped nodes
+    for x, y in layout.ellipses:
+        ax.text(x, y, u'⋮', ha='center', va='center',
+                fontsize=max(8, 400*v_spacing), zorder=4)
+
+
+def get_layout(layer_sizes, p=None, max_nodes=None, max_edges=None, seed=None):
+    '''
+    Return the node and edge geometry used by `draw_neural_net`.
+
+    The result is cached when `seed` is given, since the layout is then
+    fully determined by the arguments. Without a seed, the global
+    `np.random` state is used, so `np.random.seed` makes it reproducible.
+    '''
+    if max_nodes is not None and max_nodes < 3:
+        raise ValueError("max_nodes must be at least 3, got %d" % max_nodes)
+    if seed is None:
+        return _compute_layout(layer_sizes, p, max_nodes, max_edges, np.random)
+
+    key = (tuple(layer_sizes), p, max_nodes, max_edges, seed)
+    layout = _LAYOUT_CACHE.get(key)
+    if layout is None:
+        layout = _compute_layout(layer_sizes, p, max_nodes, max_edges,
+                                 np.random.RandomState(seed))
+        _LAYOUT_CACHE.put(key, layout)
+    return layout
+
+
+def _compute_layout(layer_sizes, p, max_nodes, max_edges, rng):
     #define some figure parameters
     left = .1 # (float) The center of the leftmost node(s) will be placed here
     right = .9 # (float) The center of the rightmost node(s) will be placed here
     bottom = .1 # (float) The center of the bottommost node(s) will be placed here
     top = .9 # (float) The center of the topmost node(s) will be placed here
 
-    n_layers = len(layer_sizes) + 1
-    v_spacing = (top - bottom)/float(max(layer_sizes))
+    # Which nodes of each layer are drawn, and in which slot
+    shown = [_shown_nodes(layer_size, max_nodes) for layer_size in layer_sizes]
+    n_slots = [len(slots) for _, slots in shown]
+
+    v_spacing = (top - bottom)/float(max(n_slots))
     h_spacing = (right - left)/float(len(layer_sizes))
     end_spacing = 0.75*min(h_spacing, v_spacing)
-    
-    if len(args)==1:
-        p = args[0]
-        droped_dict = {}
-    
-    # Nodes
-    for n, layer_size in enumerate(layer_sizes + layer_sizes[-1:]):
-        
-        layer_top = v_spacing*(layer_size - 1)/2. + (top + bottom)/2.
-        
-        if len(args)==1:
-            drops = int(np.ceil(layer_size * (1-p)))
-            selected = random.sample(range(0, layer_size),drops)
-            droped_dict[n] = selected
-            
-        for m in xrange(layer_size):
-            if n==0:
-                shade = np.random.uniform(0, 1)
-                rect = plt.Rectangle((n*h_spacing + left - v_spacing/4., layer_top - m*v_spacing - v_spacing/4.),
-                                     v_spacing/2., v_spacing/2., fc=str(shade), ec='k', zorder=4)
-                ax.add_artist(rect)
-            elif n==len(layer_sizes)-1:
-                circle = plt.Circle((n*h_spacing + left, layer_top - m*v_spacing), v_spacing/4.,
-                                    fc='#fc8d59', ec='k', zorder=4)
-                ax.add_artist(circle)
-            elif n == len(layer_sizes):
-                triangle = plt.Polygon([[(n-1)*h_spacing + left + end_spacing, layer_top - (m - 0.125)*v_spacing],
-                                        [(n-1)*h_spacing + left + end_spacing, layer_top - (m + 0.125)*v_spacing],
-                                        [(n-1)*h_spacing + left + end_spacing + 0.25*v_spacing, layer_top - m*v_spacing]],
-                                       fc='#fc8d59', ec='k', zorder=4)
-                ax.add_artist(triangle)
-            else:
-                if len(args)==1:
-                    if m in selected:
-                        circle = plt.Circle((n*h_spacing + left, layer_top - m*v_spacing), v_spacing/4.,
-                                            fc='#ffffbf', ec='k', zorder=4)
-                    else:
-                        circle = plt.Circle((n*h_spacing + left, layer_top - m*v_spacing), v_spacing/4.,
-                                            fc='#91bfdb', ec='k', zorder=4)
-                else:
-                    circle = plt.Circle((n*h_spacing + left, layer_top - m*v_spacing), v_spacing/4., 
-                                        fc='#91bfdb', ec='k', zorder=4)
-                ax.add_artist(circle)
-    
-    # Edges
-    for n, (layer_size_a, layer_size_b) in enumerate(zip(layer_sizes[:-1], layer_sizes[1:])):
-        layer_top_a = v_spacing*(layer_size_a - 1)/2. + (top + bottom)/2.
-        layer_top_b = v_spacing*(layer_size_b - 1)/2. + (top + bottom)/2.
-        for m in xrange(layer_size_a):
-            if len(args)==1:
-                if n == 0 or m not in droped_dict[n]:
-                    for o in xrange(layer_size_b):
-                        if n+2 == len(layer_sizes) or o not in droped_dict[n+1]:
-                            line = plt.Line2D([n*h_spacing + left, (n + 1)*h_spacing + left],
-                                              [layer_top_a - m*v_spacing, layer_top_b - o*v_spacing], c='k')
-                            ax.add_artist(line)
-            else:
-                for o in xrange(layer_size_b):
-                    line = plt.Line2D([n*h_spacing + left, (n + 1)*h_spacing + left],
-                                      [layer_top_a - m*v_spacing, layer_top_b - o*v_spacing], c='k')
-                    ax.add_artist(line)
-    
-    n = len(layer_sizes) - 1
-    for m in xrange(layer_sizes[-1]):
-        layer_top = v_spacing*(layer_sizes[-1] - 1)/2. + (top + bottom)/2.
-        line = plt.Line2D([n*h_spacing + left, n*h_spacing + left + end_spacing],
-                          [layer_top - m*v_spacing, layer_top - m*v_spacing], c='k')
-        ax.add_artist(line)
+
+    # Node centers, one array of y-coordinates per layer
+    xs = [n*h_spacing + left for n in xrange(len(layer_sizes))]
+    ys = [v_spacing*(n_slot - 1)/2. + (top + bottom)/2. - slots*v_spacing
+          for n_slot, (_, slots) in zip(n_slots, shown)]
+
+    # Layers with skipped nodes get an ellipsis in their middle slot
+    ellipses = [(xs[n], v_spacing*(n_slot - 1)/2. + (top + bottom)/2. - (n_slot//2)*v_spacing)
+                for n, (n_slot, layer_size) in enumerate(zip(n_slots, layer_sizes))
+                if n_slot < layer_size]
+
+    # Boolean mask of dropped neurons per layer (only hidden layers drop)
+    dropped = [np.zeros(len(nodes), dtype=bool) for nodes, _ in shown]
+    if p is not None:
+        for n in xrange(1, len(layer_sizes) - 1):
+            dropped[n] = _dropout_mask(layer_sizes[n], p, rng)[shown[n][0]]
+
+    # Input layer: squares with a random gray shade
+    y = ys[0]
+    corners = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]]) * v_spacing/4.
+    centers = np.column_stack([np.full(len(y), xs[0]), y])
+    squares = centers[:, np.newaxis, :] + corners
+    shades = rng.uniform(0, 1, len(y))
+
+    # Hidden and output layers: circles
+    circles = np.concatenate([np.column_stack([np.full(len(ys[n]), xs[n]), ys[n]])
+                              for n in xrange(1, len(ys))] or [np.empty((0, 2))])
+    circle_colors = []
+    for n in xrange(1, len(ys)):
+        if n == len(ys) - 1:
+            circle_colors.extend(['#fc8d59'] * len(ys[n]))
+        else:
+            circle_colors.extend(np.where(dropped[n], '#ffffbf', '#91bfdb'))
+
+    # Output arrows: triangles
+    y = ys[-1]
+    x = xs[-1] + end_spacing
+    triangles = np.empty((len(y), 3, 2))
+    triangles[:, :, 0] = [x, x, x + 0.25*v_spacing]
+    triangles[:, :, 1] = y[:, np.newaxis] + np.array([0.125, -0.125, 0])*v_spacing
+
+    # Edges between consecutive layers, skipping dropped neurons
+    edges = []
+    bundles = []
+    for n in xrange(len(layer_sizes) - 1):
+        y_a = ys[n][~dropped[n]]
+        y_b = ys[n+1][~dropped[n+1]]
+        if max_edges is not None and len(y_a)*len(y_b) > max_edges:
+            bundles.append([[xs[n], y_a.max()], [xs[n+1], y_b.max()],
+                            [xs[n+1], y_b.min()], [xs[n], y_a.min()]])
+        else:
+            edges.append(_edge_segments(xs[n], y_a, xs[n+1], y_b))
+
+    # Output edges
+    y = ys[-1]
+    output_edges = np.empty((len(y), 2, 2))
+    output_edges[:, :, 0] = [xs[-1], xs[-1] + end_spacing]
+    output_edges[:, :, 1] = y[:, np.newaxis]
+    edges.append(output_edges)
+
+    return Layout(v_spacing=v_spacing, squares=squares, shades=shades,
+                  circles=circles, circle_colors=circle_colors,
+                  triangles=triangles, edges=np.concatenate(edges),
+                  bundles=np.array(bundles).reshape(-1, 4, 2),
+                  ellipses=ellipses)
+
+
+def _shown_nodes(layer_size, max_nodes):
+    '''Return the indices of the drawn nodes of a layer and their slots.
+
+    If the layer is wider than `max_nodes`, only its first and last nodes are
+    drawn, leaving the middle slot free for an ellipsis, so at most
+    `max_nodes` slots are used.
+    '''
+    nodes = np.arange(layer_size)
+    if max_nodes is None or layer_size <= max_nodes:
+        return nodes, nodes
+    k = (max_nodes - 1) // 2
+    nodes = np.concatenate([nodes[:k], nodes[-k:]])
+    slots = np.concatenate([np.arange(k), np.arange(k + 1, 2*k + 1)])
+    return nodes, slots
+
+
+def _dropout_mask(layer_size, p, rng=np.random):
+    '''Return a boolean mask with ceil(layer_size * (1-p)) dropped neurons.'''
+    mask = np.zeros(layer_size, dtype=bool)
+    drops = int(np.ceil(layer_size * (1-p)))
+    mask[rng.choice(layer_size, drops, replace=False)] = True
+    return mask
+
+
+def _edge_segments(x_a, y_a, x_b, y_b):
+    '''Return line segments connecting every node in y_a to every node in y_b.'''
+    segments = np.empty((len(y_a), len(y_b), 2, 2))
+    segments[..., 0, 0] = x_a
+    segments[..., 1, 0] = x_b
+    segments[..., 0, 1] = y_a[:, np.newaxis]
+    segments[..., 1, 1] = y_b[np.newaxis, :]
+    return segments.reshape(-1, 2, 2)
+
 
 def draw_neural_net_fig(*args, **kw):
     fig = plt.figure(figsize=(12,12))
@@ -108,4 +222,4 @@ def draw_neural_net_fig(*args, **kw):
 
 if __name__ == "__main__":
     import sys
-    draw_neural_net(*sys.argv)
\ No newline at end of file
+    draw_neural_net(*sys.argv)
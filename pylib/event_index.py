@@ -0,0 +1,172 @@
+import io
+import os
+import struct
+
+import numpy as np
+import matplotlib.pyplot as plt
+import matplotlib.image as mpimg
+from tensorflow.core.util.event_pb2 import Event
+
+
+# A TFRecord is a uint64 length, a uint32 CRC of the length, the data and
+# a uint32 CRC of the data.
+_HEADER = struct.Struct('<QI')
+_FOOTER_SIZE = 4
+
+
+class _Series(object):
+    """ Columns of numbers, appended to in amortized constant time. """
+
+    def __init__(self, dtypes, capacity=64):
+        self.size = 0
+        self._columns = [np.empty(capacity, dtype=dtype) for dtype in dtypes]
+
+    def append(self, *values):
+        if self.size == len(self._columns[0]):
+            self._columns = [np.resize(column, 2 * len(column)) for column in self._columns]
+        for column, value in zip(self._columns, values):
+            column[self.size] = value
+        self.size += 1
+
+    def columns(self):
+        return [column[:self.size] for column in self._columns]
+
+
+class EventIndex(object):
+    """ Incrementally index the event files written by `tf.summary.FileWriter`.
+
+    Every `events.out.tfevents.*` file under `logdir` is read from where
+    the last `update` stopped, so only new events are parsed. Scalar
+    summaries are kept as (step, wall_time, value) arrays for each run
+    (the directory of the event file, relative to `logdir`) and tag.
+    Image summaries are indexed by their position in the event file and
+    only read when shown. Record checksums are not verified.
+
+    :usage:
+        >>> events = EventIndex(logs_path)
+        >>> events.plot_scalars('loss')
+        >>> events.show_image('kernel_weights/image/0', run='train')
+    """
+
+    def __init__(self, logdir):
+        self.logdir = logdir
+        self._offsets = {}
+        self._files = []
+        self._scalars = {}
+        self._images = {}
+
+    def _event_files(self):
+        for dirpath, _, filenames in os.walk(self.logdir):
+            for filename in sorted(filenames):
+                if 'tfevents' in filename:
+                    yield os.path.join(dirpath, filename)
+
+    def update(self):
+        """ Index the events written since the last update. Returns their number. """
+        n_events = 0
+        for path in self._event_files():
+            if path not in self._offsets:
+                self._offsets[path] = 0
+                self._files.append(path)
+            run = os.path.relpath(os.path.dirname(path), self.logdir)
+            with open(path, 'rb') as f:
+                f.seek(self._offsets[path])
+                buf = f.read()
+            n_events += self._index_records(buf, run, self._files.index(path),
+                                            self._offsets[path])
+        return n_events
+
+    def _index_records(self, buf, run, file_id, base_offset):
+        pos = 0
+        n_events = 0
+        while pos + _HEADER.size <= len(buf):
+            length, _ = _HEADER.unpack_from(buf, pos)
+            end = pos + _HEADER.size + length + _FOOTER_SIZE
+            if end > len(buf):
+                # The writer hasn't finished this record; read it next time
+                break
+            event = Event.FromString(buf[pos + _HEADER.size:end - _FOOTER_SIZE])
+            self._index_event(event, run, file_id, base_offset + pos)
+            pos = end
+            n_events += 1
+        self._offsets[self._files[file_id]] = base_offset + pos
+        return n_events
+
+    def _index_event(self, event, run, file_id, offset):
+        if not event.HasField('summary'):
+            return
+        for value in event.summary.value:
+            kind = value.WhichOneof('value')
+            if kind == 'simple_value':
+                series = self._scalars.get((run, value.tag))
+                if series is None:
+                    series = self._scalars[run, value.tag] = _Series([np.int64, np.float64,
+                                                                      np.float32])
+                series.append(event.step, event.wall_time, value.simple_value)
+            elif kind == 'image':
+                series = self._images.get((run, value.tag))
+                if series is None:
+                    series = self._images[run, value.tag] = _Series([np.int64, np.int32,
+                                                                     np.int64])
+                series.append(event.step, file_id, offset)
+
+    def runs(self):
+        return sorted(set(run for run, _ in self._scalars) | set(run for run, _ in self._images))
+
+    def tags(self, run=None):
+        """ Return the (scalar tags, image tags) of `run` (default: all runs). """
+        def select(index):
+            return sorted(set(tag for r, tag in index if run is None or r == run))
+        return select(self._scalars), select(self._images)
+
+    def scalars(self, tag, run='.'):
+        """ Return the (steps, wall_times, values) arrays of a scalar summary. """
+        return self._scalars[run, tag].columns()
+
+    def image_steps(self, tag, run='.'):
+        return self._images[run, tag].columns()[0]
+
+    def image(self, tag, run='.', index=-1):
+        """ Return the `index`-th image of an image summary, as an array. """
+        steps, file_ids, offsets = self._images[run, tag].columns()
+        with open(self._files[file_ids[index]], 'rb') as f:
+            f.seek(offsets[index])
+            length, _ = _HEADER.unpack(f.read(_HEADER.size))
+            event = Event.FromString(f.read(length))
+        for value in event.summary.value:
+            if value.tag == tag:
+                return mpimg.imread(io.BytesIO(value.image.encoded_image_string))
+        raise KeyError(tag)
+
+    def plot_scalars(self, tags=None, runs=None, ax=None, update=True):
+        """ Plot scalar summaries against the step, updating the index first.
+
+        `tags` and `runs` are names or lists of names (default: all).
+        """
+        if update:
+            self.update()
+        if isinstance(tags, basestring):
+            tags = [tags]
+        if isinstance(runs, basestring):
+            runs = [runs]
+        if ax is None:
+            ax = plt.gca()
+        for run, tag in sorted(self._scalars):
+            if (tags is None or tag in tags) and (runs is None or run in runs):
+                steps, _, values = self.scalars(tag, run)
+                ax.plot(steps, values, label=tag if run == '.' else '%s/%s' % (run, tag))
+        ax.set_xlabel('step')
+        ax.legend()
+        return ax
+
+    def show_image(self, tag, run='.', index=-1, ax=None, update=True, **kwargs):
+        """ Show the `index`-th image of an image summary. """
+        if update:
+            self.update()
+        if ax is None:
+            ax = plt.gca()
+        step = self.image_steps(tag, run)[index]
+        ax.imshow(self.image(tag, run, index), interpolation='nearest', **kwargs)
+        ax.set_title('%s (step %d)' % (tag, step))
+        ax.axis('off')
+        return ax
@@ -0,0 +1,69 @@
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """ A mapping that evicts its least recently used entries.
+
+    Entries are counted, or weighed by `sizeof(value)` if given, and
+    evicted oldest first once the total exceeds `max_size` (the newest
+    entry is always kept). `on_evict(value)` is called for every evicted
+    value, e.g. to close it.
+
+    :usage:
+        >>> cache = LRUCache(32)
+        >>> value = cache.get(key)
+        >>> if value is None:
+        ...     value = compute(key)
+        ...     cache.put(key, value)
+    """
+
+    def __init__(self, max_size, sizeof=None, on_evict=None):
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.on_evict = on_evict
+        self.size = 0
+        self._entries = OrderedDict()
+
+    def _weight(self, value):
+        return 1 if self.sizeof is None else self.sizeof(value)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """ Return the value of `key`, marking it as the most recently used. """
+        if key not in self._entries:
+            return default
+        value = self._entries.pop(key)
+        self._entries[key] = value
+        return value
+
+    def put(self, key, value):
+        """ Insert `value` as the most recently used entry, then evict. """
+        self.pop(key)
+        self._entries[key] = value
+        self.size += self._weight(value)
+        while self.size > self.max_size and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= self._weight(evicted)
+            if self.on_evict is not None:
+                self.on_evict(evicted)
+
+    def pop(self, key, default=None):
+        """ Remove `key` and return its value (without calling `on_evict`). """
+        if key not in self._entries:
+            return default
+        value = self._entries.pop(key)
+        self.size -= self._weight(value)
+        return value
+
+    def values(self):
+        return list(self._entries.values())
+
+    def clear(self):
+        """ Remove all entries (without calling `on_evict`). """
+        self._entries.clear()
+        self.size = 0
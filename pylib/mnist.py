@@ -0,0 +1,213 @@
+import gzip
+import os
+import urllib
+from collections import namedtuple
+
+import numpy as np
+
+from pylib.prefetch import Prefetcher
+
+
+SOURCE_URL = 'https://storage.googleapis.com/cvdf-datasets/mnist/'
+FILES = {'train': ('train-images-idx3-ubyte.gz', 'train-labels-idx1-ubyte.gz'),
+         'test': ('t10k-images-idx3-ubyte.gz', 't10k-labels-idx1-ubyte.gz')}
+CACHE_DIR = os.environ.get('MNIST_CACHE_DIR',
+                           os.path.join(os.path.expanduser('~'), '.mnist_cache'))
+N_CLASSES = 10
+
+Datasets = namedtuple('Datasets', ['train', 'validation', 'test'])
+
+_IDX_DTYPES = {0x08: np.uint8, 0x09: np.int8, 0x0B: '>i2', 0x0C: '>i4',
+               0x0D: '>f4', 0x0E: '>f8'}
+
+
+def read_idx(path):
+    """ Read a (gzipped) IDX file into an array. """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        buf = f.read()
+    zero, dtype_code, ndim = np.frombuffer(buf, dtype=np.uint8, count=4)[[0, 2, 3]]
+    if zero != 0 or dtype_code not in _IDX_DTYPES:
+        raise ValueError("%s is not an IDX file" % path)
+    shape = np.frombuffer(buf, dtype='>u4', count=ndim, offset=4)
+    return np.frombuffer(buf, dtype=_IDX_DTYPES[dtype_code],
+                         offset=4 + 4 * ndim).reshape(shape)
+
+
+def _cache_paths(cache_dir, split):
+    return (os.path.join(cache_dir, split + '-images.npy'),
+            os.path.join(cache_dir, split + '-labels.npy'))
+
+
+def seed_cache(source_dir='/tmp/data/', cache_dir=None, download=True):
+    """ Convert the MNIST IDX files in `source_dir` to the uint8 .npy cache.
+
+    Missing files are downloaded to `source_dir` if `download` is set;
+    otherwise only local files are used. Images are stored flattened
+    (one row of 784 pixels per image), like `input_data` returns them.
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    for split, filenames in FILES.items():
+        arrays = []
+        for filename in filenames:
+            path = os.path.join(source_dir, filename)
+            if not os.path.exists(path):
+                if not download:
+                    raise IOError("%s not found, and downloading is disabled" % path)
+                if not os.path.isdir(source_dir):
+                    os.makedirs(source_dir)
+                urllib.urlretrieve(SOURCE_URL + filename, path)
+            arrays.append(read_idx(path))
+        images, labels = arrays
+        for path, array in zip(_cache_paths(cache_dir, split),
+                               [images.reshape(len(images), -1), labels]):
+            # Write under a temporary name, so a partial file is never loaded
+            tmp_path = path + '.tmp.npy'
+            np.save(tmp_path, array)
+            os.rename(tmp_path, path)
+
+
+class _IndexStream(object):
+    """ Hand out indices in shuffled epochs, like `DataSet.next_batch`. """
+
+    def __init__(self, n, shuffle=True, seed=None):
+        self.n = n
+        self.shuffle = shuffle
+        self.rng = np.random.RandomState(seed)
+        self.epochs_completed = 0
+        self._new_epoch()
+
+    def _new_epoch(self):
+        self._order = self.rng.permutation(self.n) if self.shuffle else np.arange(self.n)
+        self._position = 0
+
+    def take(self, k):
+        parts = []
+        while k > 0:
+            part = self._order[self._position:self._position + k]
+            parts.append(part)
+            self._position += len(part)
+            k -= len(part)
+            if self._position == self.n:
+                self.epochs_completed += 1
+                self._new_epoch()
+        return np.concatenate(parts)
+
+
+class MNISTSplit(object):
+    """ One split of MNIST, backed by memory-mapped uint8 arrays.
+
+    Batches are converted to float images in [0, 1] (and one-hot labels)
+    only when they are drawn, and epochs are shuffled by permuting
+    indices, never the data. `images` and `labels` convert the whole
+    split on first access, for compatibility with `input_data`.
+    """
+
+    def __init__(self, raw_images, raw_labels, one_hot=True, dtype=np.float32,
+                 seed=None):
+        self.raw_images = raw_images
+        self.raw_labels = raw_labels
+        self.one_hot = one_hot
+        self.dtype = dtype
+        self._stream = _IndexStream(len(raw_images), seed=seed)
+        self._images = None
+        self._labels = None
+
+    @property
+    def num_examples(self):
+        return len(self.raw_images)
+
+    @property
+    def epochs_completed(self):
+        return self._stream.epochs_completed
+
+    @property
+    def images(self):
+        if self._images is None:
+            self._images = self.convert_images(self.raw_images)
+        return self._images
+
+    @property
+    def labels(self):
+        if self._labels is None:
+            self._labels = self.convert_labels(self.raw_labels)
+        return self._labels
+
+    def convert_images(self, raw_images):
+        # Always a copy: raw_images may be the read-only memory map.
+        # Like input_data, integer images are not scaled.
+        if np.issubdtype(self.dtype, np.integer):
+            return np.array(raw_images, dtype=self.dtype)
+        return np.multiply(raw_images, 1. / 255, dtype=self.dtype)
+
+    def convert_labels(self, raw_labels):
+        if self.one_hot:
+            return np.eye(N_CLASSES, dtype=self.dtype)[raw_labels]
+        return np.asarray(raw_labels, dtype=np.int64)
+
+    def batch(self, index):
+        """ Return the (images, labels) batch of the examples at `index`. """
+        index = np.sort(index)  # Read the memory map in order
+        return (self.convert_images(self.raw_images[index]),
+                self.convert_labels(self.raw_labels[index]))
+
+    def next_batch(self, batch_size, shuffle=True):
+        """ Return the next (images, labels) batch of the current epoch. """
+        self._stream.shuffle = shuffle
+        return self.batch(self._stream.take(batch_size))
+
+    def batches(self, batch_size, prefetch=2, shuffle=True, seed=None):
+        """ Return a BatchPrefetcher of `batch_size` batches of this split. """
+        return BatchPrefetcher(self, batch_size, prefetch, shuffle, seed)
+
+
+class BatchPrefetcher(Prefetcher):
+    """ Prepare batches of a MNISTSplit on a background thread.
+
+    The prefetcher has its own shuffling state, so it does not interfere
+    with `next_batch` calls on the split.
+
+    :usage:
+        >>> batches = data.train.batches(batch_size=100)
+        >>> for i in xrange(num_iterations):
+        ...     x_batch, y_true_batch = batches.next_batch()
+        >>> batches.close()
+    """
+
+    def __init__(self, split, batch_size, prefetch=2, shuffle=True, seed=None):
+        self.split = split
+        self.batch_size = batch_size
+        self._stream = _IndexStream(split.num_examples, shuffle, seed)
+        super(BatchPrefetcher, self).__init__(prefetch)
+
+    def make_batch(self):
+        return self.split.batch(self._stream.take(self.batch_size))
+
+
+def load_mnist(source_dir='/tmp/data/', one_hot=True, dtype=np.float32,
+               validation_size=5000, cache_dir=None, download=True, seed=None):
+    """ Open MNIST from the memory-mapped cache, seeding it first if needed.
+
+    A drop-in replacement for `input_data.read_data_sets(source_dir, one_hot)`:
+    returns Datasets(train, validation, test) of MNISTSplit, where the first
+    `validation_size` training images form the validation split. Once the
+    cache exists, neither `source_dir` nor the network is used.
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    if not all(os.path.exists(path) for split in FILES
+               for path in _cache_paths(cache_dir, split)):
+        seed_cache(source_dir, cache_dir, download)
+    arrays = {split: [np.load(path, mmap_mode='r') for path in _cache_paths(cache_dir, split)]
+              for split in FILES}
+    (train_images, train_labels), (test_images, test_labels) = arrays['train'], arrays['test']
+
+    def make_split(images, labels, offset):
+        return MNISTSplit(images, labels, one_hot, dtype,
+                          seed=None if seed is None else seed + offset)
+
+    return Datasets(
+        train=make_split(train_images[validation_size:], train_labels[validation_size:], 0),
+        validation=make_split(train_images[:validation_size], train_labels[:validation_size], 1),
+        test=make_split(test_images, test_labels, 2))
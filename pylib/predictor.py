@@ -0,0 +1,127 @@
+import hashlib
+import weakref
+
+import numpy as np
+import tensorflow as tf
+
+from pylib.lru import LRUCache
+
+
+CHUNK_SIZE = 4096
+RESULT_CACHE_SIZE = 16
+PREDICTOR_CACHE_SIZE = 16
+
+_VARIABLE_OPS = ('Variable', 'VariableV2', 'VarHandleOp')
+
+
+def _dependent_variables(tensor):
+    """ Return the variables `tensor` is computed from. """
+    seen = set()
+    stack = [tensor.op]
+    var_ops = set()
+    while stack:
+        op = stack.pop()
+        if op in seen:
+            continue
+        seen.add(op)
+        if op.type in _VARIABLE_OPS:
+            var_ops.add(op)
+        stack.extend(t.op for t in op.inputs)
+        stack.extend(op.control_inputs)
+    with tensor.graph.as_default():
+        return [var for var in tf.global_variables() if var.op in var_ops]
+
+
+def _fingerprint(variables):
+    """ A small tensor that changes whenever any of `variables` changes.
+
+    Holds the sum of each variable's elements and their sum weighted by
+    position, so it costs a single reduction over the weights.
+    """
+    parts = []
+    for var in variables:
+        flat = tf.cast(tf.reshape(var, [-1]), tf.float64)
+        ramp = tf.cast(tf.range(tf.size(flat)), tf.float64)
+        parts.extend([tf.reduce_sum(flat), tf.reduce_sum(flat * ramp)])
+    return tf.stack(parts) if parts else tf.zeros([0], tf.float64)
+
+
+def _array_key(array):
+    array = np.ascontiguousarray(array)
+    return (array.shape, array.dtype.str, hashlib.sha1(array).hexdigest())
+
+
+class Predictor(object):
+    """ Evaluate a model output on large inputs in chunks, with caching.
+
+    The output op (with an optional `activation`, like `tf.nn.sigmoid`
+    on logits) is built once, when the predictor is created. Inputs are
+    fed `chunk_size` rows at a time, which bounds the memory of a run.
+    Results are cached, keyed on the input values and on a fingerprint
+    of the variables the output depends on, so evaluating the same grid
+    again (e.g. to re-plot it) doesn't run the network, until the model
+    is trained further.
+
+    :usage:
+        >>> predict = get_predictor(sess, x, y, tf.nn.sigmoid)
+        >>> ymesh = predict(mesh)
+    """
+
+    def __init__(self, sess, inputs, output, activation=None, chunk_size=CHUNK_SIZE,
+                 cache_size=RESULT_CACHE_SIZE):
+        self.sess = sess
+        self.inputs = inputs
+        self.chunk_size = chunk_size
+        self._results = LRUCache(cache_size)
+        with output.graph.as_default(), tf.name_scope('predictor'):
+            self.output = output if activation is None else activation(output)
+            self.variables = _dependent_variables(output)
+            self._fingerprint = _fingerprint(self.variables)
+
+    def __call__(self, inputs, feed_dict=None):
+        """ Return the output for `inputs`, fed with the extra `feed_dict`. """
+        feed_dict = feed_dict or {}
+        key = (self.sess.run(self._fingerprint).tobytes(), _array_key(inputs),
+               tuple(sorted((t.name, _array_key(v)) for t, v in feed_dict.items())))
+        result = self._results.get(key)
+        if result is None:
+            result = self._evaluate(inputs, feed_dict)
+            self._results.put(key, result)
+        return result
+
+    def _evaluate(self, inputs, feed_dict):
+        chunks = []
+        for start in xrange(0, max(len(inputs), 1), self.chunk_size):
+            chunk_feed = dict(feed_dict)
+            chunk_feed[self.inputs] = inputs[start:start + self.chunk_size]
+            chunks.append(self.sess.run(self.output, feed_dict=chunk_feed))
+        result = np.concatenate(chunks) if len(chunks) > 1 else chunks[0]
+        result.flags.writeable = False
+        return result
+
+    def clear(self):
+        self._results.clear()
+
+
+_predictors = LRUCache(PREDICTOR_CACHE_SIZE)
+# Weak reference to the graph of the cached predictors
+_predictors_graph = None
+
+def get_predictor(sess, inputs, output, activation=None, **kwargs):
+    """ Return a Predictor, reusing the one made earlier for the same arguments.
+
+    Calling this again (e.g. when re-running a notebook cell) doesn't add
+    any ops to the graph. Only the predictors of one graph are kept: they
+    are dropped when a predictor is asked for on another graph (e.g. after
+    `reset_tf`), so they don't keep the old graph and session alive.
+    """
+    global _predictors_graph
+    if _predictors_graph is None or _predictors_graph() is not output.graph:
+        _predictors.clear()
+        _predictors_graph = weakref.ref(output.graph)
+    key = (sess, inputs, output, activation, tuple(sorted(kwargs.items())))
+    predictor = _predictors.get(key)
+    if predictor is None:
+        predictor = Predictor(sess, inputs, output, activation, **kwargs)
+        _predictors.put(key, predictor)
+    return predictor
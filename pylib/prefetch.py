@@ -0,0 +1,79 @@
+import sys
+import threading
+import Queue
+
+
+class _Failure(object):
+    """ Put on the queue in place of a batch when `make_batch` raised. """
+
+    def __init__(self, exc_info):
+        self.exc_info = exc_info
+
+
+class Prefetcher(object):
+    """ Prepare batches on a background thread while the model trains.
+
+    Subclasses implement `make_batch`, and call `Prefetcher.__init__` once
+    everything `make_batch` uses is set up, since the thread starts
+    right away. With `prefetch > 0`, up to `prefetch` batches are kept
+    ready on a queue; with `prefetch=0`, `next_batch` makes them when
+    asked. If `make_batch` raises on the thread, the thread stops and
+    `next_batch` raises the same exception.
+    """
+
+    def __init__(self, prefetch=2):
+        self._queue = None
+        self._failure = None
+        self._stop = threading.Event()
+        if prefetch > 0:
+            self._queue = Queue.Queue(maxsize=prefetch)
+            self._thread = threading.Thread(target=self._fill_queue)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def make_batch(self):
+        """ Return a new batch, without using the prefetch queue. """
+        raise NotImplementedError
+
+    def _fill_queue(self):
+        while not self._stop.is_set():
+            try:
+                batch = self.make_batch()
+            except Exception:
+                batch = _Failure(sys.exc_info())
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(batch, timeout=0.1)
+                    break
+                except Queue.Full:
+                    pass
+            if isinstance(batch, _Failure):
+                return
+
+    def next_batch(self):
+        """ Return the next batch. """
+        if self._queue is None:
+            if self._stop.is_set():
+                raise ValueError("next_batch on a closed prefetcher")
+            return self.make_batch()
+        while self._failure is None:
+            # Wake up now and then, so a close() from another thread is seen
+            if self._stop.is_set():
+                raise ValueError("next_batch on a closed prefetcher")
+            try:
+                batch = self._queue.get(timeout=0.1)
+            except Queue.Empty:
+                continue
+            if not isinstance(batch, _Failure):
+                return batch
+            self._failure = batch
+        exc_type, exc_value, traceback = self._failure.exc_info
+        raise exc_type, exc_value, traceback
+
+    def __iter__(self):
+        while True:
+            yield self.next_batch()
+
+    def close(self):
+        """ Stop the prefetching thread. """
+        self._stop.set()
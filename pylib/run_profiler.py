@@ -0,0 +1,195 @@
+import time
+from collections import namedtuple
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.python.client import timeline
+
+
+CallStats = namedtuple('CallStats', ['convert', 'run', 'device', 'host', 'feed_bytes',
+                                     'fetch_bytes'])
+OpStats = namedtuple('OpStats', ['name', 'op_type', 'calls', 'total_micros', 'peak_bytes'])
+
+
+def _nbytes(values):
+    if isinstance(values, np.ndarray):
+        return values.nbytes
+    if isinstance(values, dict):
+        return sum(_nbytes(value) for value in values.values())
+    if isinstance(values, (list, tuple)):
+        return sum(_nbytes(value) for value in values)
+    return np.asarray(values).nbytes if values is not None else 0
+
+
+class ProfiledSession(object):
+    """ Wrap a session to see where the time of `sess.run` calls goes.
+
+    For every call, the wrapper records (as a CallStats):
+        - convert : time spent converting the feed values to arrays of
+          the fed tensors' dtypes (the copies `feed_dict` would otherwise
+          make inside `sess.run`),
+        - run : time spent in `sess.run`,
+        - device : time the ops took to execute, on sampled calls (NaN
+          otherwise),
+        - host : `run - device`, on sampled calls (NaN otherwise). This is
+          the session's own overhead, including passing in the feeds and
+          copying the fetched values into NumPy arrays; the Python API
+          does not time the fetches separately,
+        - feed_bytes, fetch_bytes : sizes of the fed and fetched values.
+
+    Every `sample_every` calls (never if 0), the call is traced, and the
+    per-op execution times and memory are added to `op_table`. The first
+    `warmup` calls are never traced, since they include one-off costs
+    such as memory allocation and autotuning. The report gives the run
+    time of the sampled calls next to their device time. The trace
+    of the last sampled call is written to `trace_path`, in the Chrome
+    trace format (open it at chrome://tracing). Without sampling, the
+    cost of the wrapper is a few timer calls and the feed conversion.
+
+    Other attributes are those of the wrapped session, so the wrapper can
+    be used in its place.
+
+    :usage:
+        >>> psess = ProfiledSession(sess, sample_every=100, trace_path='timeline.json')
+        >>> for i in range(num_iterations):
+        ...     psess.run(optimizer, feed_dict={x: x_batch, y_true: y_true_batch})
+        >>> print psess.report()
+    """
+
+    def __init__(self, sess, sample_every=0, trace_path=None, warmup=1):
+        self.sess = sess
+        self.sample_every = sample_every
+        self.warmup = warmup
+        self.trace_path = trace_path
+        self.calls = []
+        self._ops = {}
+        self._op_types = {}
+        self._sampled_calls = 0
+
+    def __getattr__(self, name):
+        return getattr(self.sess, name)
+
+    def _convert_feed(self, feed_dict):
+        converted = {}
+        for key, value in feed_dict.items():
+            dtype = key.dtype.as_numpy_dtype if isinstance(key, tf.Tensor) else None
+            converted[key] = np.asarray(value, dtype=dtype)
+        return converted
+
+    def run(self, fetches, feed_dict=None, options=None, run_metadata=None):
+        start = time.time()
+        feed_dict = self._convert_feed(feed_dict or {})
+        convert_time = time.time() - start
+
+        n_calls = len(self.calls)
+        sample = (self.sample_every > 0 and options is None and run_metadata is None
+                  and n_calls >= self.warmup
+                  and (n_calls - self.warmup) % self.sample_every == 0)
+        if sample:
+            options = tf.RunOptions(trace_level=tf.RunOptions.FULL_TRACE)
+            run_metadata = tf.RunMetadata()
+
+        start = time.time()
+        values = self.sess.run(fetches, feed_dict=feed_dict, options=options,
+                               run_metadata=run_metadata)
+        run_time = time.time() - start
+
+        device_time = float('nan')
+        if sample:
+            device_time = self._add_step_stats(run_metadata.step_stats)
+        self.calls.append(CallStats(convert_time, run_time, device_time, run_time - device_time,
+                                    sum(value.nbytes for value in feed_dict.values()),
+                                    _nbytes(values)))
+        return values
+
+    def _op_type(self, name):
+        if name not in self._op_types:
+            try:
+                self._op_types[name] = self.sess.graph.get_operation_by_name(name).type
+            except (KeyError, ValueError):
+                self._op_types[name] = ''
+        return self._op_types[name]
+
+    def _add_step_stats(self, step_stats):
+        """ Add a traced call to the op table, and return its execution time in seconds. """
+        starts, ends = [], []
+        for dev_stats in step_stats.dev_stats:
+            # GPU kernels are also reported per stream, and the host tracer
+            # repeats the CPU ops under /host:CPU; count them once
+            if '/stream:' in dev_stats.device and not dev_stats.device.endswith('/stream:all'):
+                continue
+            if dev_stats.device.startswith('/host:'):
+                continue
+            for node in dev_stats.node_stats:
+                # GPU kernels are named "op:kernel"
+                name = node.node_name.split(':')[0]
+                peak_bytes = sum(output.tensor_description.allocation_description.allocated_bytes
+                                 for output in node.output)
+                calls, total, peak = self._ops.get(name, (0, 0, 0))
+                self._ops[name] = (calls + 1, total + node.all_end_rel_micros,
+                                   max(peak, peak_bytes))
+                starts.append(node.all_start_micros)
+                ends.append(node.all_start_micros + node.all_end_rel_micros)
+        self._sampled_calls += 1
+        if self.trace_path is not None:
+            with open(self.trace_path, 'w') as f:
+                f.write(timeline.Timeline(step_stats).generate_chrome_trace_format())
+        return (max(ends) - min(starts)) * 1e-6 if starts else 0.0
+
+    def op_table(self, top=None):
+        """ Return OpStats for the ops of the sampled calls, slowest first.
+
+        `total_micros` is summed over the sampled calls and `peak_bytes` is
+        the largest size of the op's outputs.
+        """
+        table = sorted((OpStats(name, self._op_type(name), calls, total, peak)
+                        for name, (calls, total, peak) in self._ops.items()),
+                       key=lambda stats: -stats.total_micros)
+        return table[:top]
+
+    def call_summary(self, sampled=False):
+        """ Return the mean CallStats over all calls (device, host: over sampled calls).
+
+        With `sampled`, all means are over the sampled calls only, so `run`
+        is the sum of `device` and `host`.
+        """
+        stats = np.array(self.calls, dtype=float).reshape(-1, len(CallStats._fields))
+        traced = ~np.isnan(stats[:, 2])
+        if sampled:
+            stats, traced = stats[traced], traced[traced]
+        if not len(stats):
+            return None
+        means = stats.mean(axis=0)
+        means[2:4] = stats[traced, 2:4].mean(axis=0) if traced.any() else float('nan')
+        return CallStats(*means)
+
+    def report(self, top=15):
+        """ Return a text report of the call timings and the slowest ops. """
+        summary = self.call_summary()
+        if summary is None:
+            return "No calls recorded"
+        lines = ["%d calls, per call: feed conversion %.2f ms, run %.2f ms, fed %.1f kB, "
+                 "fetched %.1f kB"
+                 % (len(self.calls), 1e3 * summary.convert, 1e3 * summary.run,
+                    summary.feed_bytes / 1e3, summary.fetch_bytes / 1e3)]
+        sampled = self.call_summary(sampled=True)
+        if sampled is not None:
+            lines.append("%d sampled calls, per call: run %.2f ms = device %.2f ms + host "
+                         "%.2f ms (session overhead, feed and fetch copies)"
+                         % (self._sampled_calls, 1e3 * sampled.run, 1e3 * sampled.device,
+                            1e3 * sampled.host))
+        table = self.op_table(top)
+        if table:
+            lines.append("%-40s %-20s %12s %12s" % ("op", "type", "ms / call", "peak kB"))
+            for stats in table:
+                lines.append("%-40s %-20s %12.3f %12.1f"
+                             % (stats.name[-40:], stats.op_type[:20],
+                                stats.total_micros / 1e3 / self._sampled_calls,
+                                stats.peak_bytes / 1e3))
+        return '\n'.join(lines)
+
+    def reset(self):
+        """ Forget the recorded calls and op statistics. """
+        self.calls = []
+        self._ops = {}
+        self._sampled_calls = 0
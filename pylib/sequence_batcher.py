@@ -0,0 +1,86 @@
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+from pylib.prefetch import Prefetcher
+
+
+def _char_codes(text):
+    """ Return the code point of every character of `text` as an array. """
+    if isinstance(text, unicode):
+        return np.frombuffer(text.encode('utf-32-le'), dtype='<u4')
+    return np.frombuffer(text, dtype=np.uint8)
+
+
+def encode_text(text, chars=None):
+    """ Encode every character of `text` as its index in `chars`.
+
+    The whole text is encoded at once with vectorized lookups, instead of
+    calling `chars.index(c)` per character. If `chars` is not given, the
+    sorted distinct characters of `text` are used.
+
+    Returns (data, chars), where data is a uint8 array when there are at
+    most 256 distinct characters.
+    """
+    codes = _char_codes(text)
+    if chars is None:
+        _, first, data = np.unique(codes, return_index=True, return_inverse=True)
+        chars = [text[i] for i in first]
+    else:
+        char_codes = _char_codes(u''.join(chars) if isinstance(text, unicode)
+                                 else ''.join(chars))
+        order = np.argsort(char_codes)
+        positions = np.searchsorted(char_codes[order], codes)
+        positions = np.minimum(positions, len(chars) - 1)
+        if not np.array_equal(char_codes[order][positions], codes):
+            raise ValueError("text contains characters that are not in chars")
+        data = order[positions]
+    dtype = np.uint8 if len(chars) <= 256 else np.int32
+    return data.astype(dtype), chars
+
+
+def decode_text(data, chars):
+    """ Return the text for an array of character indices. """
+    return ''.join(chars[i] for i in data)
+
+
+class SequenceBatcher(Prefetcher):
+    """ Draw random (input, target) character sequences from encoded text.
+
+    Every window of `time_steps + 1` characters is a row of a strided view
+    of `data`, so a batch is a single fancy-indexing operation. Targets are
+    the inputs shifted by one character. With `prefetch > 0`, upcoming
+    batches are prepared on a background thread while the model trains.
+
+    :usage:
+        >>> data, chars = encode_text(txt)
+        >>> batches = SequenceBatcher(data, batch_size=50, time_steps=100)
+        >>> x_batch, y_batch = batches.next_batch()
+    """
+
+    def __init__(self, data, batch_size, time_steps, prefetch=2, seed=None):
+        data = np.ascontiguousarray(data)
+        n_windows = len(data) - time_steps
+        if n_windows < batch_size:
+            raise ValueError("data is too short for %d sequences of %d steps"
+                             % (batch_size, time_steps))
+        stride = data.strides[0]
+        self.windows = as_strided(data, shape=(n_windows, time_steps + 1),
+                                  strides=(stride, stride))
+        self.windows.flags.writeable = False
+        self.batch_size = batch_size
+        self.rng = np.random.RandomState(seed)
+
+        super(SequenceBatcher, self).__init__(prefetch)
+
+    def make_batch(self):
+        """ Return a new (x_batch, y_batch) pair, without using the prefetch queue. """
+        # Distinct start positions, like `random.sample`. Collisions are
+        # rare, so redraw them rather than permuting every position.
+        n_windows = len(self.windows)
+        starts = np.unique(self.rng.randint(n_windows, size=self.batch_size))
+        while len(starts) < self.batch_size:
+            extra = self.rng.randint(n_windows, size=self.batch_size - len(starts))
+            starts = np.unique(np.concatenate([starts, extra]))
+        self.rng.shuffle(starts)
+        batch = self.windows[starts]
+        return batch[:, :-1], batch[:, 1:]
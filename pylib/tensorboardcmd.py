@@ -1,12 +1,26 @@
 import socket
 from IPython.display import HTML
 
+def local_ip():
+    """ Return an address of this machine, without sending any traffic.
+
+    Prefers a non-loopback address of the host name, and falls back to
+    127.0.0.1 (e.g. on nodes without network configuration).
+    """
+    try:
+        infos = socket.getaddrinfo(socket.gethostname(), None, socket.AF_INET)
+    except socket.error:
+        infos = []
+    addresses = [info[4][0] for info in infos]
+    for address in addresses:
+        if not address.startswith('127.'):
+            return address
+    return '127.0.0.1'
+
 def tensorboard_cmd(logs):
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    s.connect(("8.8.8.8", 80))
-    ip = s.getsockname()[0]
-    s.close()
-    
+    ip = local_ip()
+
     return HTML("""<p>Run at the command line:
     <tt>tensorboard --logdir={log}</tt><br />
-    Then open <a href="http://{ip}:6006/" target="_blank">http://{ip}:6006/</a></p>""".format(log=logs, ip=ip))
+    Then open <a href="http://{ip}:6006/" target="_blank">http://{ip}:6006/</a><br />
+    Or plot the summaries here with <tt>pylib.event_index.EventIndex('{log}')</tt></p>""".format(log=logs, ip=ip))
@@ -0,0 +1,133 @@
+import numpy as np
+import tensorflow as tf
+
+from pylib.sequence_batcher import encode_text
+
+
+class StreamingTextGenerator(object):
+    """ Generate text from a character RNN without leaving the session.
+
+    The recurrent state and the last sampled character of every sequence
+    are kept in variables, and characters are sampled on the graph in
+    chunks of `chunk_size` with a `tf.while_loop`. Each `sess.run` then
+    produces a whole chunk for all `batch_size` sequences, instead of
+    copying the state to and from Python for every character.
+
+    :usage:
+        >>> def step_fn(x_enc, state):
+        ...     y, _, new_state = make_lstm(x_enc, state, n_chars, lstm_size, n_layers)
+        ...     return y, new_state
+        >>> generator = StreamingTextGenerator(step_fn, chars, n_layers*2*lstm_size)
+        >>> for chunk in generator.generate(sess, "We", 500):
+        ...     print chunk[0],
+
+    :parameters:
+        - step_fn : function
+            Takes one-hot inputs of shape (batch, time, n_chars) and an
+            initial state of shape (batch, state_size), and returns the
+            logits (shape (batch * time, n_chars) or (batch, time, n_chars))
+            and the new state. It is called with variable reuse turned on,
+            so it must create its variables under the same names as when
+            the model was trained (e.g. give `tf.layers.dense` a `name`).
+        - chars : list
+            The characters, indexed like the model's inputs.
+        - state_size : int
+            Size of the flattened recurrent state.
+        - batch_size : int
+            Number of sequences generated in parallel.
+        - chunk_size : int
+            Number of characters sampled per `sess.run`.
+        - temperature : float
+            Softmax temperature used when sampling (lower is more
+            conservative).
+    """
+
+    def __init__(self, step_fn, chars, state_size, batch_size=1, chunk_size=100,
+                 temperature=1.0):
+        self.chars = chars
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        n_chars = len(chars)
+
+        with tf.variable_scope('text_generation'):
+            self.state = tf.Variable(tf.zeros([batch_size, state_size]),
+                                     trainable=False, name='state')
+            self.last_char = tf.Variable(tf.zeros([batch_size], dtype=tf.int32),
+                                         trainable=False, name='last_char')
+
+        def step(char_ids, state):
+            # Reuse the trained model's variables
+            with tf.variable_scope(tf.get_variable_scope(), reuse=True):
+                logits, new_state = step_fn(tf.one_hot(char_ids, depth=n_chars), state)
+            logits = tf.reshape(logits, [batch_size, -1, n_chars])
+            # Sample from the prediction after the last input character
+            sampled = tf.multinomial(logits[:, -1, :] / temperature, 1)[:, 0]
+            return tf.cast(sampled, tf.int32), new_state
+
+        # Priming: run the prompts through the model from a zero state
+        self.prompts = tf.placeholder(tf.int32, [batch_size, None], name='prompts')
+        first_char, primed_state = step(self.prompts, tf.zeros([batch_size, state_size]))
+        self.prime_op = tf.group(self.state.assign(primed_state),
+                                 self.last_char.assign(first_char))
+
+        # Generation: sample `chunk_size` characters, feeding each one back in
+        def body(i, char_ids, state, output):
+            next_ids, new_state = step(char_ids[:, tf.newaxis], state)
+            return i + 1, next_ids, new_state, output.write(i, next_ids)
+
+        output = tf.TensorArray(tf.int32, size=chunk_size)
+        _, last_ids, final_state, output = tf.while_loop(
+            lambda i, *args: i < chunk_size, body,
+            [tf.constant(0), self.last_char.value(), self.state.value(), output])
+        with tf.control_dependencies([self.state.assign(final_state),
+                                      self.last_char.assign(last_ids)]):
+            self.chunk = tf.transpose(output.stack())
+
+    def prime(self, sess, prompts):
+        """ Set the state by running `prompts` through the model.
+
+        This must be called before generating (`generate` does it).
+        `prompts` is a string (used for every sequence) or a list of
+        `batch_size` strings of equal length. Returns the first sampled
+        character of each sequence.
+        """
+        if isinstance(prompts, basestring):
+            prompts = [prompts] * self.batch_size
+        if len(prompts) != self.batch_size:
+            raise ValueError("expected %d prompts, got %d" % (self.batch_size, len(prompts)))
+        if len(set(len(prompt) for prompt in prompts)) != 1:
+            raise ValueError("all prompts must have the same length")
+        encoded = np.array([encode_text(prompt, self.chars)[0] for prompt in prompts])
+        sess.run(self.prime_op, feed_dict={self.prompts: encoded})
+        return [self.chars[i] for i in sess.run(self.last_char)]
+
+    def generate(self, sess, prompts, length):
+        """ Yield generated text in chunks, continuing from `prompts`.
+
+        Each chunk is a list with the next characters of every sequence.
+        In total, `length` characters are generated per sequence, and
+        nothing is yielded if `length` is less than 1.
+        """
+        if length < 1:
+            return
+        # The first character of each sequence is sampled while priming
+        pending = self.prime(sess, prompts)
+        generated = 1
+        while generated < length:
+            n = min(self.chunk_size, length - generated)
+            ids = sess.run(self.chunk)[:, :n]
+            yield [first + ''.join(self.chars[i] for i in row)
+                   for first, row in zip(pending, ids)]
+            pending = [''] * self.batch_size
+            generated += n
+        if pending[0]:
+            yield pending
+
+    def generate_text(self, sess, prompts, length):
+        """ Return the prompts followed by `length` generated characters. """
+        if isinstance(prompts, basestring):
+            prompts = [prompts] * self.batch_size
+        texts = list(prompts)
+        for chunk in self.generate(sess, prompts, length):
+            texts = [text + part for text, part in zip(texts, chunk)]
+        return texts
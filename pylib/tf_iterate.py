@@ -0,0 +1,115 @@
+from collections import namedtuple
+
+import tensorflow as tf
+
+
+Trajectory = namedtuple('Trajectory', ['final', 'states', 'records', 'steps'])
+
+
+def _as_list(values):
+    if isinstance(values, (list, tuple)):
+        return list(values)
+    return [values]
+
+
+class FusedIteration(object):
+    """ Run an update rule for many steps inside a single `sess.run`.
+
+    The rule is compiled into a `tf.while_loop`, so there is no Python
+    round-trip (and no `feed_dict` copy) per step. Data the rule needs can
+    be fed once per `run` through placeholders.
+
+    :usage:
+        >>> # Newton's method for f(x) = x**2 - 2
+        >>> newton = FusedIteration(lambda x: x - (x**2 - 2) / (2*x),
+        ...                         initial=[2.], max_steps=10, tol=1e-12)
+        >>> newton.run(sess).states[0]
+
+        >>> # Gradient descent, recording the loss and updating W and b
+        >>> def step(W, b):
+        ...     loss = tf.reduce_mean((tf.matmul(x, W) + b - y_label)**2)
+        ...     grad_W, grad_b = tf.gradients(loss, [W, b])
+        ...     return W - eta * grad_W, b - eta * grad_b
+        >>> gd = FusedIteration(step, variables=[W, b], max_steps=20,
+        ...                     record=lambda W, b: loss_of(W, b))
+        >>> gd.run(sess, feed_dict={x: X, y_label: y}).records[0]
+
+    :parameters:
+        - update : function
+            Takes the current state tensors and returns the next ones.
+        - initial : list of tensors or values, optional
+            Initial state (defaults to the values of `variables`).
+        - variables : list of tf.Variable, optional
+            Variables holding the state; the final state is assigned back.
+        - max_steps : int
+            Default number of steps (can be overridden in `run`).
+        - tol : float, optional
+            Stop early once no state element changes by more than `tol`.
+        - record : function, optional
+            Takes the state tensors and returns tensors recorded every step
+            (e.g. the loss).
+    """
+
+    def __init__(self, update, initial=None, variables=None, max_steps=100,
+                 tol=None, record=None):
+        if initial is None:
+            initial = variables
+        initial = [tf.convert_to_tensor(value) for value in _as_list(initial)]
+        self.variables = variables
+        self.n_steps = tf.placeholder_with_default(
+            tf.constant(max_steps, dtype=tf.int32), [], name='n_steps')
+        # A negative tolerance never stops the loop early.
+        self.tol = tf.placeholder_with_default(
+            tf.constant(-1. if tol is None else tol, dtype=tf.float64), [], name='tol')
+
+        def record_all(state):
+            return [] if record is None else [tf.convert_to_tensor(r)
+                                              for r in _as_list(record(*state))]
+
+        initial_records = record_all(initial)
+        histories = [tf.TensorArray(value.dtype, size=1, dynamic_size=True,
+                                    element_shape=value.shape).write(0, value)
+                     for value in initial + initial_records]
+        n_state = len(initial)
+
+        def cond(i, done, state, histories):
+            return tf.logical_and(i < self.n_steps, tf.logical_not(done))
+
+        def body(i, done, state, histories):
+            new_state = [tf.convert_to_tensor(value) for value in _as_list(update(*state))]
+            new_state = [tf.cast(new, old.dtype) for new, old in zip(new_state, state)]
+            for new, old in zip(new_state, state):
+                new.set_shape(old.shape)
+            change = tf.reduce_max([tf.reduce_max(tf.abs(tf.cast(new - old, tf.float64)))
+                                    for new, old in zip(new_state, state)])
+            histories = [history.write(i + 1, value) for history, value
+                         in zip(histories, new_state + record_all(new_state))]
+            return i + 1, change <= self.tol, new_state, histories
+
+        steps, _, final, histories = tf.while_loop(
+            cond, body, [tf.constant(0), tf.constant(False), initial, histories])
+
+        if variables is not None:
+            # Store the final state, then read it back from the variables.
+            with tf.control_dependencies([var.assign(value)
+                                          for var, value in zip(variables, final)]):
+                final = [tf.identity(value) for value in final]
+
+        self.fetches = Trajectory(final=final,
+                                  states=[h.stack() for h in histories[:n_state]],
+                                  records=[h.stack() for h in histories[n_state:]],
+                                  steps=steps)
+
+    def run(self, sess, feed_dict=None, n_steps=None, tol=None):
+        """ Run the iteration and return a Trajectory of NumPy arrays.
+
+        `states` and `records` hold one array per state tensor or recorded
+        tensor, whose first axis is the step (index 0 is the initial state).
+        `steps` is the number of steps taken.
+        """
+        feed_dict = dict(feed_dict or {})
+        if n_steps is not None:
+            feed_dict[self.n_steps] = n_steps
+        if tol is not None:
+            feed_dict[self.tol] = tol
+        return sess.run(self.fetches, feed_dict=feed_dict)
@@ -0,0 +1,141 @@
+import tensorflow as tf
+
+from pylib.lru import LRUCache
+
+
+def session_config(intra_op_threads=0, inter_op_threads=0):
+    """ Return a ConfigProto with the given thread pool sizes (0 = TF default). """
+    return tf.ConfigProto(intra_op_parallelism_threads=intra_op_threads,
+                          inter_op_parallelism_threads=inter_op_threads)
+
+
+def _freeze(value):
+    """ Return a hashable version of a hyperparameter value. """
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(val)) for key, val in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(val) for val in value)
+    return value
+
+
+class Model(object):
+    """ A graph built by a model-builder function, with its own session.
+
+    `outputs` is whatever the builder returned (typically a dict of tensors
+    and ops). Variables are initialized when the model is built.
+    """
+
+    def __init__(self, graph, sess, outputs):
+        self.graph = graph
+        self.sess = sess
+        self.outputs = outputs
+        with graph.as_default():
+            self._init_all = tf.global_variables_initializer()
+        # Op reporting uninitialized variables, and the variables it checks
+        self._uninitialized = None
+        self._checked_vars = []
+
+    def __getitem__(self, name):
+        return self.outputs[name]
+
+    def run(self, fetches, feed_dict=None, **kwargs):
+        return self.sess.run(fetches, feed_dict=feed_dict, **kwargs)
+
+    def reset_vars(self, var_list=None):
+        """ Re-initialize `var_list` (default: all global variables). """
+        if var_list is None:
+            self.sess.run(self._init_all)
+        else:
+            self.sess.run(tf.variables_initializer(var_list))
+
+    def init_new_vars(self):
+        """ Initialize only the variables that have not been initialized yet.
+
+        Useful after adding ops to the graph (e.g. an optimizer with slot
+        variables) without losing the values of the existing variables.
+        Returns the names of the variables that were initialized.
+        """
+        with self.graph.as_default():
+            all_vars = tf.global_variables()
+            # Only add a new report op if variables were added since the last one
+            if all_vars != self._checked_vars:
+                self._uninitialized = tf.report_uninitialized_variables(all_vars)
+                self._checked_vars = all_vars
+            names = set(name.decode() for name in self.sess.run(self._uninitialized))
+            if not names:
+                return []
+            new_vars = [var for var in all_vars if var.op.name in names]
+            self.sess.run(tf.variables_initializer(new_vars))
+        return [var.op.name for var in new_vars]
+
+    def close(self):
+        self.sess.close()
+
+
+class SessionManager(object):
+    """ Build and cache graphs keyed on a model-builder and its hyperparameters.
+
+    :usage:
+        >>> manager = SessionManager(intra_op_threads=4, inter_op_threads=2)
+        >>> model = manager.get(build_mlp, n_hidden=64, eta=0.1)
+        >>> model.run(model['train_op'], feed_dict={...})
+
+    Asking again for the same builder and hyperparameters returns the
+    cached graph and session instead of building them again. With
+    `reset=True` all of its variables are re-initialized (by the one
+    initializer op built with the graph), so each experiment starts
+    fresh; with `reset=False` the trained values are kept, and only
+    variables added to the graph since are initialized. At most
+    `max_graphs` graphs are kept; the least recently used one is closed
+    when another is built.
+    """
+
+    def __init__(self, intra_op_threads=0, inter_op_threads=0, max_graphs=8):
+        self.config = session_config(intra_op_threads, inter_op_threads)
+        self._models = LRUCache(max_graphs, on_evict=lambda model: model.close())
+
+    def get(self, builder, reset=True, **hparams):
+        """ Return the Model for `builder(**hparams)`, building it if needed. """
+        key = (builder, _freeze(hparams))
+        model = self._models.get(key)
+        if model is None:
+            model = self.build(builder, **hparams)
+            self._models.put(key, model)
+        elif reset:
+            model.reset_vars()
+        else:
+            model.init_new_vars()
+        return model
+
+    def build(self, builder, **hparams):
+        """ Build `builder(**hparams)` in a new graph and session (uncached). """
+        graph = tf.Graph()
+        with graph.as_default():
+            outputs = builder(**hparams)
+        model = Model(graph, tf.Session(graph=graph, config=self.config), outputs)
+        model.reset_vars()
+        return model
+
+    def clear(self):
+        """ Close all cached sessions. """
+        for model in self._models.values():
+            model.close()
+        self._models.clear()
+
+
+# The notebooks' `reset_tf`/`reset_vars`, using the default graph:
+#     sess = reset_tf()
+_sess = None
+
+def reset_tf(intra_op_threads=0, inter_op_threads=0):
+    """ Close the current session, reset the default graph, return a new session. """
+    global _sess
+    if _sess is not None:
+        _sess.close()
+    tf.reset_default_graph()
+    _sess = tf.Session(config=session_config(intra_op_threads, inter_op_threads))
+    return _sess
+
+def reset_vars(sess=None):
+    """ Initialize all variables of the default graph. """
+    (sess or _sess).run(tf.global_variables_initializer())
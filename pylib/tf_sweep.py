@@ -0,0 +1,96 @@
+from collections import namedtuple
+
+import numpy as np
+import tensorflow as tf
+
+from pylib.tf_iterate import FusedIteration
+
+
+SweepResult = namedtuple('SweepResult', ['losses', 'params'])
+
+
+def linear_model(x, W, b):
+    """ Evaluate K linear models on the same inputs with one batched product.
+
+    `x` has shape (n, d), `W` has shape (K, d, out) and `b` has shape
+    (K, out). Returns predictions of shape (K, n, out).
+    """
+    y = tf.transpose(tf.tensordot(x, W, axes=[[1], [1]]), [1, 0, 2])
+    return y + tf.expand_dims(b, 1)
+
+
+class LearningRateSweep(object):
+    """ Train one copy of a model per learning rate, all at once.
+
+    The model parameters are stacked along a new leading axis of size
+    K = len(etas), so every step updates all K models with batched ops,
+    and the whole run happens in a single `sess.run` (see FusedIteration).
+
+    :usage:
+        >>> def mse(params, x, y_label):
+        ...     W, b = params
+        ...     y = linear_model(x, W, b)
+        ...     return tf.reduce_mean(tf.square(y - y_label), axis=[1, 2])
+        >>> sweep = LearningRateSweep(mse, [np.zeros((13, 1)), np.zeros(1)],
+        ...                           [0.05, 0.1, 0.15, 0.162, 0.171],
+        ...                           x, y_label, n_steps=20)
+        >>> result = sweep.run(sess, {x: Xs_train, y_label: y_train.reshape(-1, 1)})
+        >>> plt.plot(result.losses.T, '.-')
+
+    :parameters:
+        - loss_fn : function
+            Takes the list of stacked parameters (each with leading axis K),
+            the inputs and the labels, and returns the K losses.
+        - initial : list of arrays
+            Initial parameters of a single model; every copy starts here.
+        - etas : list of float
+            The learning rates, one per model copy.
+        - x, y_label : tensors
+            Inputs and labels (usually placeholders, fed once per run).
+        - n_steps : int
+            Number of gradient descent steps.
+        - batch_size : int, optional
+            Train on random minibatches of this size (the same batch for
+            every model) instead of on all of `x`. The recorded losses are
+            always computed on all of `x`.
+    """
+
+    def __init__(self, loss_fn, initial, etas, x, y_label, n_steps=20,
+                 batch_size=None):
+        K = len(etas)
+        self.etas = tf.placeholder_with_default(
+            np.asarray(etas, dtype=np.float32), [K], name='etas')
+        initial = [np.tile(np.asarray(value, dtype=np.float32)[np.newaxis],
+                           (K,) + (1,) * np.ndim(value))
+                   for value in initial]
+
+        def step(*params):
+            if batch_size is None:
+                x_batch, y_batch = x, y_label
+            else:
+                batch = tf.random_uniform([batch_size], maxval=tf.shape(x)[0],
+                                          dtype=tf.int32)
+                x_batch, y_batch = tf.gather(x, batch), tf.gather(y_label, batch)
+            # The models are independent, so the gradient of the summed
+            # losses with respect to slice k is that of model k's loss.
+            grads = tf.gradients(tf.reduce_sum(loss_fn(list(params), x_batch, y_batch)),
+                                 list(params))
+            return [param - tf.reshape(self.etas, [K] + [1] * (param.shape.ndims - 1)) * grad
+                    for param, grad in zip(params, grads)]
+
+        self.iteration = FusedIteration(
+            step, initial=initial, max_steps=n_steps,
+            record=lambda *params: loss_fn(list(params), x, y_label))
+
+    def run(self, sess, feed_dict=None, etas=None, n_steps=None):
+        """ Train all models and return a SweepResult.
+
+        `losses` has shape (K, n_steps + 1), starting with the initial loss.
+        `params` holds one array per parameter, of shape (K, n_steps + 1, ...).
+        """
+        feed_dict = dict(feed_dict or {})
+        if etas is not None:
+            feed_dict[self.etas] = etas
+        trajectory = self.iteration.run(sess, feed_dict, n_steps=n_steps)
+        return SweepResult(losses=trajectory.records[0].T,
+                           params=[np.swapaxes(state, 0, 1) for state in trajectory.states])
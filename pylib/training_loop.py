@@ -0,0 +1,169 @@
+import threading
+import time
+import Queue
+from collections import namedtuple
+
+
+SummaryOverhead = namedtuple('SummaryOverhead', ['steps', 'summary_steps', 'total_time',
+                                                 'summary_time', 'fraction'])
+
+
+class AsyncSummaryWriter(object):
+    """ Hand summaries to a `tf.summary.FileWriter` on a background thread.
+
+    `add_summary` only puts the serialized summary on a queue. The thread
+    parses and writes everything that is waiting at once, and flushes
+    the file at most every `flush_secs` seconds (and on `close`). The
+    FileWriter itself is left open.
+    """
+
+    def __init__(self, writer, flush_secs=1.0, max_queue=100):
+        self.writer = writer
+        self.flush_secs = flush_secs
+        self._queue = Queue.Queue(maxsize=max_queue)
+        self._error = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._write_loop)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _write_loop(self):
+        last_flush = time.time()
+        done = False
+        while not done:
+            try:
+                items = [self._queue.get(timeout=self.flush_secs)]
+            except Queue.Empty:
+                items = []
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except Queue.Empty:
+                    break
+            try:
+                for item in items:
+                    if item is None:
+                        done = True
+                    else:
+                        self.writer.add_summary(*item)
+                if items and (done or time.time() - last_flush >= self.flush_secs):
+                    self.writer.flush()
+                    last_flush = time.time()
+            except Exception as e:
+                self._error = e
+                done = True
+
+    def add_summary(self, summary, global_step=None):
+        if self._error is not None:
+            raise self._error
+        self._queue.put((summary, global_step))
+
+    def close(self):
+        """ Write the remaining summaries and stop the thread. """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+
+class TrainingLoop(object):
+    """ Run training steps, evaluating summaries only every so often.
+
+    Summaries are evaluated in the same `sess.run` as the training op,
+    every `every_n_steps` steps and/or once `every_n_secs` seconds have
+    passed since the last ones, and written by an AsyncSummaryWriter.
+    The time of every step is measured, so `overhead` can report how
+    much longer the summary steps took than the others.
+
+    :usage:
+        >>> loop = TrainingLoop(sess, optimizer, merged, train_writer, every_n_steps=100)
+        >>> for i in range(num_iterations):
+        ...     x_batch, y_batch = data.train.next_batch(batch_size)
+        ...     _, l = loop.run({x: x_batch}, summary_fetches=loss)
+        ...     if l is not None:
+        ...         print "Step %d, loss %f" % (i, l)
+        >>> loop.close()
+        >>> print loop.report()
+    """
+
+    def __init__(self, sess, train_op, summary_op=None, writer=None, every_n_steps=100,
+                 every_n_secs=None, flush_secs=1.0):
+        if every_n_steps is None and every_n_secs is None:
+            raise ValueError("set every_n_steps or every_n_secs")
+        self.sess = sess
+        self.train_op = train_op
+        self.summary_op = summary_op
+        self.writer = None if writer is None else AsyncSummaryWriter(writer, flush_secs)
+        self.every_n_steps = every_n_steps
+        self.every_n_secs = every_n_secs
+        self.step = 0
+        self._last_summary_time = None
+        self._train_time = 0.0
+        self._summary_time = 0.0
+        self._summary_steps = 0
+
+    def summary_due(self):
+        """ Whether the next step evaluates summaries. """
+        if self.every_n_steps is not None and self.step % self.every_n_steps == 0:
+            return True
+        if self.every_n_secs is not None:
+            return (self._last_summary_time is None or
+                    time.time() - self._last_summary_time >= self.every_n_secs)
+        return False
+
+    def run(self, feed_dict=None, fetches=None, summary_fetches=None, force_summary=False):
+        """ Run one training step.
+
+        Returns the values of `fetches`, and those of `summary_fetches`
+        on summary steps (None on the other steps).
+        """
+        summarize = force_summary or self.summary_due()
+        # sess.run doesn't take None fetches, so only ask for what is set
+        run_fetches = {'train': self.train_op}
+        if fetches is not None:
+            run_fetches['values'] = fetches
+        if summarize:
+            if summary_fetches is not None:
+                run_fetches['summary_values'] = summary_fetches
+            if self.summary_op is not None:
+                run_fetches['summary'] = self.summary_op
+
+        start = time.time()
+        results = self.sess.run(run_fetches, feed_dict=feed_dict)
+        if summarize:
+            if 'summary' in results and self.writer is not None:
+                self.writer.add_summary(results['summary'], self.step)
+            self._last_summary_time = time.time()
+            self._summary_time += self._last_summary_time - start
+            self._summary_steps += 1
+        else:
+            self._train_time += time.time() - start
+        self.step += 1
+        return results.get('values'), results.get('summary_values')
+
+    def overhead(self):
+        """ Estimate the time spent on summaries, as a SummaryOverhead.
+
+        `summary_time` is the time the summary steps took beyond that of
+        as many ordinary steps, and `fraction` its share of the total.
+        """
+        plain_steps = self.step - self._summary_steps
+        plain_step_time = self._train_time / plain_steps if plain_steps else 0.0
+        total_time = self._train_time + self._summary_time
+        summary_time = max(self._summary_time - self._summary_steps * plain_step_time, 0.0)
+        return SummaryOverhead(steps=self.step, summary_steps=self._summary_steps,
+                               total_time=total_time, summary_time=summary_time,
+                               fraction=summary_time / total_time if total_time else 0.0)
+
+    def report(self):
+        overhead = self.overhead()
+        return ("%d steps in %.2f s, %d with summaries; summary overhead %.2f s (%.1f%%)"
+                % (overhead.steps, overhead.total_time, overhead.summary_steps,
+                   overhead.summary_time, 100 * overhead.fraction))
+
+    def close(self):
+        """ Write the pending summaries and stop the writer thread. """
+        if self.writer is not None:
+            self.writer.close()
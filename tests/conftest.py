@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Make `pylib` importable however pytest is started
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matplotlib
+matplotlib.use('Agg')
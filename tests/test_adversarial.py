@@ -0,0 +1,76 @@
+import numpy as np
+from numpy.testing import assert_allclose
+import pytest
+import tensorflow as tf
+
+from pylib.adversarial import AdversarialNoiseBank
+
+IMG_SHAPE = (2, 2, 1)
+N_CLASSES = 3
+KERNEL = np.array([[1., 0., 0.], [0., 1., 0.], [0., 0., 1.], [0., 0., 0.]], dtype=np.float32)
+
+
+def model_fn(images):
+    with tf.variable_scope('logits'):
+        kernel = tf.get_variable('kernel', initializer=KERNEL)
+        bias = tf.get_variable('bias', initializer=np.zeros(N_CLASSES, dtype=np.float32))
+    return tf.matmul(tf.reshape(images, [-1, 4]), kernel) + bias
+
+
+@pytest.fixture
+def images():
+    rng = np.random.RandomState(0)
+    x = rng.uniform(0.2, 0.8, size=(12, 4)).astype(np.float32)
+    labels = np.eye(N_CLASSES, dtype=np.float32)[rng.randint(N_CLASSES, size=12)]
+    return x, labels
+
+
+@pytest.fixture
+def session():
+    with tf.Graph().as_default(), tf.Session() as sess:
+        yield sess
+
+
+def make_bank(**kwargs):
+    x = tf.placeholder(tf.float32, [None, 4])
+    y_true = tf.placeholder(tf.float32, [None, N_CLASSES])
+    model_fn(x)
+    return AdversarialNoiseBank(model_fn, x, IMG_SHAPE, N_CLASSES, y_true=y_true, **kwargs)
+
+
+def test_fooling_rates_leave_out_the_target_class(session, images):
+    x, labels = images
+    bank = make_bank()
+    session.run(tf.global_variables_initializer())
+
+    predicted = x.dot(KERNEL).argmax(axis=1)
+    true_cls = labels.argmax(axis=1)
+    expected = [np.mean(predicted[true_cls != k] == k) for k in range(N_CLASSES)]
+    # The noise starts at zero, so the fooling rates are the classifier's
+    assert_allclose(bank.evaluate(session, x, labels, batch_size=5), expected)
+    assert_allclose(session.run(bank.fooling_rates, {bank.x: x, bank.y_true: labels}),
+                    expected)
+
+
+def test_training_fools_the_classifier(session, images):
+    x, labels = images
+    bank = make_bank(noise_limit=0.5, learning_rate=0.05)
+    session.run(tf.global_variables_initializer())
+    kernel = session.run('logits/kernel:0')
+
+    curves = bank.train(session, lambda: images, 100)
+    assert curves.shape == (100, N_CLASSES)
+    assert (bank.evaluate(session, x, labels) > curves[0]).all()
+    assert np.abs(session.run(bank.noise)).max() <= 0.5 + 1e-6
+    # Only the noise is trained
+    assert_allclose(session.run('logits/kernel:0'), kernel)
+
+
+def test_initializer_covers_only_new_variables(session):
+    x = tf.placeholder(tf.float32, [None, 4])
+    model_fn(x)
+    classifier_vars = set(tf.global_variables())
+    bank = AdversarialNoiseBank(model_fn, x, IMG_SHAPE, N_CLASSES)
+    session.run(bank.initializer)
+    uninitialized = set(session.run(tf.report_uninitialized_variables()))
+    assert uninitialized == set(var.op.name.encode() for var in classifier_vars)
@@ -0,0 +1,94 @@
+import numpy as np
+from numpy.testing import assert_allclose
+import matplotlib.pyplot as plt
+
+from pylib.conv_widget import ConvFrameStore, ConvWidget
+
+
+def naive_filter(image, kernel):
+    """ Filter by applying the kernel at every pixel, like the original demo. """
+    padded = ConvWidget.add_padding(image.astype(float), kernel)
+    i_pad, j_pad = ConvWidget.padding_for_kernel(kernel)
+    result = np.zeros(image.shape)
+    for (i, j), _ in ConvWidget.iter_pixels(image):
+        patch = padded[tuple(ConvWidget.window_slice((i + i_pad, j + j_pad), kernel))]
+        # Filter each colour channel separately
+        result[i, j] = np.tensordot(kernel, patch, axes=2)
+    return result
+
+
+def test_filter_image_matches_pixel_loop():
+    rng = np.random.RandomState(0)
+    image = rng.uniform(size=(7, 9))
+    kernel = rng.uniform(-1, 1, size=(3, 5))
+    assert_allclose(ConvWidget.filter_image(image, kernel), naive_filter(image, kernel))
+
+
+def test_filter_image_rgb():
+    rng = np.random.RandomState(1)
+    image = rng.uniform(size=(6, 5, 3))
+    kernel = rng.uniform(-1, 1, size=(3, 3))
+    filtered = ConvWidget.filter_image(image, kernel)
+    assert filtered.shape == image.shape
+    assert_allclose(filtered, naive_filter(image, kernel))
+
+
+def test_filter_image_bank_stacks_kernels():
+    rng = np.random.RandomState(2)
+    image = rng.uniform(size=(5, 5))
+    kernels = rng.uniform(-1, 1, size=(4, 3, 3))
+    bank = ConvWidget.filter_image_bank(image, kernels)
+    assert bank.shape == (4, 5, 5)
+    for kernel, filtered in zip(kernels, bank):
+        assert_allclose(filtered, ConvWidget.filter_image(image, kernel))
+
+
+def test_sliding_windows_is_a_read_only_view():
+    image = np.arange(20.).reshape(4, 5)
+    windows = ConvWidget.sliding_windows(image, np.ones((3, 3)))
+    assert windows.shape == (2, 3, 3, 3)
+    assert_allclose(windows[1, 2], image[1:4, 2:5])
+    assert not windows.flags.writeable
+
+
+def test_reveal_pixels():
+    filtered = np.arange(6.).reshape(2, 3)
+    partial = ConvWidget.reveal_pixels(filtered, 4)
+    assert_allclose(partial.ravel()[:4], [0, 1, 2, 3])
+    assert np.isnan(partial.ravel()[4:]).all()
+
+
+def test_frame_store_masks_final_image():
+    rng = np.random.RandomState(3)
+    image = rng.uniform(size=(4, 5))
+    kernel = rng.uniform(-1, 1, size=(3, 3))
+    frames = ConvFrameStore(image, kernel)
+    assert len(frames) == 20
+    assert_allclose(frames.filtered(19), ConvWidget.filter_image(image, kernel))
+    assert np.isnan(frames.filtered(6).ravel()[7:]).all()
+
+
+def test_frame_store_overlay_cache_is_bounded():
+    image = np.random.RandomState(4).uniform(size=(6, 6))
+    frames = ConvFrameStore(image, np.ones((3, 3)))
+    frame_bytes = frames.kernel_overlay(0).nbytes
+    frames = ConvFrameStore(image, np.ones((3, 3)), max_cache_bytes=3 * frame_bytes)
+    for i_step in range(10):
+        frames.kernel_overlay(i_step)
+    assert len(frames._overlays) == 3
+    # A cached overlay is returned as is
+    assert frames.kernel_overlay(9) is frames.kernel_overlay(9)
+
+
+def test_incremental_steps_reveal_and_hide_pixels():
+    rng = np.random.RandomState(5)
+    image = rng.uniform(size=(4, 6))
+    kernel = rng.uniform(-1, 1, size=(3, 3))
+    step = ConvWidget.make_incremental_step_function(image, kernel)
+    final = ConvWidget.filter_image(image, kernel)
+    artist = plt.gcf().axes[1].images[0]
+    for i_step in [10, 3, 23, 0]:
+        step(i_step)
+        assert_allclose(np.asarray(artist.get_array().filled(np.nan)),
+                        ConvWidget.reveal_pixels(final, i_step + 1))
+    plt.close('all')
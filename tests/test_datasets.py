@@ -0,0 +1,73 @@
+import argparse
+import pickle
+import os
+
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+
+from pylib import datasets
+
+
+def write_bunch(path, data, target):
+    with open(str(path), 'wb') as f:
+        pickle.dump(argparse.Namespace(data=data, target=target), f)
+
+
+def test_shuffle_split_partitions_the_rows():
+    train, test = datasets.shuffle_split(10, test_size=0.2, random_state=0)
+    assert len(test) == 2
+    assert sorted(np.concatenate([train, test])) == list(range(10))
+    permutation = np.random.RandomState(0).permutation(10)
+    assert_array_equal(test, permutation[:2])
+
+
+def test_load_tabular_stores_split_and_statistics(tmpdir):
+    data = np.arange(40, dtype=float).reshape(20, 2)
+    target = np.arange(20)
+    source = tmpdir.join('bunch.pkl')
+    write_bunch(source, data, target)
+
+    dataset = datasets.load_tabular(str(source), test_size=0.25, random_state=1)
+    assert isinstance(dataset.data, np.memmap)
+    assert_array_equal(dataset.X_train, data[dataset.train_index])
+    assert_array_equal(dataset.y_test, target[dataset.test_index])
+    assert len(dataset.X_test) == 5
+    assert_allclose(dataset.mean, data[dataset.train_index].mean(axis=0))
+    assert_allclose(dataset.std, data[dataset.train_index].std(axis=0))
+
+    Xs_train, _, _, _ = dataset.split(standardize=True)
+    assert_allclose(Xs_train.mean(axis=0), 0, atol=1e-12)
+
+
+def test_load_tabular_rebuilds_when_source_changes(tmpdir, monkeypatch):
+    source = tmpdir.join('bunch.pkl')
+    write_bunch(source, np.zeros((10, 1)), np.zeros(10))
+    datasets.load_tabular(str(source))
+
+    loads = []
+    load_pickle = datasets._load_pickle
+    monkeypatch.setattr(datasets, '_load_pickle',
+                        lambda path: loads.append(path) or load_pickle(path))
+    datasets.load_tabular(str(source))
+    assert loads == []
+
+    write_bunch(source, np.ones((20, 1)), np.ones(20))
+    dataset = datasets.load_tabular(str(source))
+    assert loads == [str(source)]
+    assert len(dataset.data) == 20
+
+    # Different split options need their own conversion
+    datasets.load_tabular(str(source), random_state=0)
+    assert len(loads) == 2
+
+
+def test_load_text_caches_encoding(tmpdir):
+    source = tmpdir.join('text.txt')
+    source.write('Hello hello')
+    data, chars = datasets.load_text(str(source), lower=True)
+    assert isinstance(data, np.memmap)
+    assert ''.join(chars[i] for i in data) == 'hello hello'
+    assert os.path.isdir(datasets.default_cache_dir(str(source)))
+
+    data, chars = datasets.load_text(str(source))
+    assert ''.join(chars[i] for i in data) == 'Hello hello'
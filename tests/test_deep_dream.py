@@ -0,0 +1,49 @@
+import numpy as np
+from numpy.testing import assert_allclose
+import pytest
+import tensorflow as tf
+
+from pylib.deep_dream import DeepDream
+
+
+@pytest.fixture
+def dreamer():
+    graph = tf.Graph()
+    with graph.as_default():
+        image = tf.placeholder(tf.float32, [None, None, None, 3], name='input')
+        tf.multiply(image, 2., name='layer')
+    with tf.Session(graph=graph) as sess:
+        yield DeepDream(graph, image, sess, tile_size=4, tiles_per_run=3, seed=0)
+
+
+def periodic_image(height, width):
+    # Every 4x4 tile of this image, rolled or wrapped, has the same values
+    pattern = np.array([[[0., 1., 2.], [3., 4., 5.]], [[6., 7., 8.], [9., 10., 11.]]])
+    return np.tile(pattern, (height // 2, width // 2, 1)).astype(np.float32)
+
+
+@pytest.mark.parametrize('shape', [(8, 12), (10, 6), (3, 3)])
+def test_tiled_gradient_matches_whole_image(dreamer, shape):
+    image = periodic_image(*shape) if shape[0] % 2 == 0 else np.arange(27.).reshape(3, 3, 3)
+    gradient = dreamer.gradient('layer')
+    tiled = dreamer.tiled_gradient(gradient, image)
+    # The gradient of mean((2x)**2) is proportional to x, normalized per tile
+    assert_allclose(tiled, image / image.std(), rtol=1e-5)
+
+
+def test_gradient_ops_are_cached(dreamer):
+    gradient = dreamer.gradient('layer')
+    assert dreamer.gradient(dreamer.graph.get_tensor_by_name('layer:0')) is gradient
+
+    image = np.full((9, 7, 3), 100., dtype=np.float32)
+    result = dreamer.dream('layer', image, num_octaves=2, num_iterations=2, step_size=1.)
+    n_ops = len(dreamer.graph.get_operations())
+    result = dreamer.dream('layer', image, num_octaves=3, num_iterations=1)
+    assert len(dreamer.graph.get_operations()) == n_ops
+    assert result.shape == image.shape
+    assert result.dtype == np.uint8
+
+
+def test_resize(dreamer):
+    image = np.ones((6, 4, 3), dtype=np.float32)
+    assert_allclose(dreamer.resize(image, [3, 2]), np.ones((3, 2, 3)))
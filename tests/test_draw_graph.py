@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from pylib import draw_graph
+
+
+class FakeDot(object):
+    """ Stands in for pydot, counting how often a graph is rendered. """
+
+    def __init__(self):
+        self.calls = 0
+
+    def graph_from_dot_data(self, source):
+        self.calls += 1
+
+        class Graph(object):
+            def create(self, format):
+                return b'<' + format.encode('ascii') + b'>' + source
+        return Graph()
+
+
+@pytest.fixture
+def dot(monkeypatch):
+    fake = FakeDot()
+    monkeypatch.setattr(draw_graph, 'pydot', fake)
+    monkeypatch.setattr(draw_graph, 'CACHE_DIR', None)
+    draw_graph._render_cache.clear()
+    return fake
+
+
+def test_render_is_cached_per_source_and_format(dot):
+    assert draw_graph.render('digraph g { a -> b }') == b'<png>digraph g { a -> b }'
+    draw_graph.render(u'digraph g { a -> b }')
+    assert dot.calls == 1
+    draw_graph.render('digraph g { a -> b }', fmt='svg')
+    draw_graph.render('digraph g { b -> a }')
+    assert dot.calls == 3
+
+
+def test_render_uses_disk_cache(dot, monkeypatch, tmpdir):
+    cache_dir = str(tmpdir.join('graphs'))
+    monkeypatch.setattr(draw_graph, 'CACHE_DIR', cache_dir)
+    data = draw_graph.render('digraph g { a -> b }')
+    assert len(os.listdir(cache_dir)) == 1
+
+    # A new session starts with an empty memory cache
+    draw_graph._render_cache.clear()
+    assert draw_graph.render('digraph g { a -> b }') == data
+    assert dot.calls == 1
+
+
+def test_prerender_fills_cache(dot):
+    draw_graph.prerender(['add-op', 'const-op'])
+    assert dot.calls == 2
+    draw_graph.draw_graph('add-op')
+    assert dot.calls == 2
@@ -0,0 +1,72 @@
+import numpy as np
+import matplotlib.pyplot as plt
+import pytest
+from matplotlib.collections import LineCollection
+
+from pylib import draw_nn
+
+
+def line_segments(ax):
+    collections = [c for c in ax.collections if isinstance(c, LineCollection)]
+    return np.concatenate([c.get_segments() for c in collections])
+
+
+def test_edges_connect_consecutive_layers():
+    fig, ax = plt.subplots()
+    draw_nn.draw_neural_net(ax, [3, 4, 2])
+    # 3*4 + 4*2 edges between layers, plus one output edge per output node
+    assert len(line_segments(ax)) == 22
+    plt.close(fig)
+
+
+def test_dropped_neurons_lose_their_edges():
+    np.random.seed(0)
+    fig, ax = plt.subplots()
+    draw_nn.draw_neural_net(ax, [3, 4, 2], 0.5)
+    # Two of the four hidden neurons are dropped
+    assert len(line_segments(ax)) == 3*2 + 2*2 + 2
+    plt.close(fig)
+
+
+def test_dropout_mask():
+    mask = draw_nn._dropout_mask(10, 0.75, np.random.RandomState(0))
+    assert mask.dtype == bool
+    assert mask.sum() == 3
+
+
+def test_wide_layers_are_elided():
+    layout = draw_nn.get_layout([10, 3], max_nodes=5)
+    # Two nodes either side of the ellipsis, plus the output layer
+    assert len(layout.squares) == 4
+    assert len(layout.circles) == 3
+    assert len(layout.ellipses) == 1
+    assert len(layout.edges) == 4*3 + 3
+
+
+def test_max_nodes_counts_the_ellipsis():
+    layout = draw_nn.get_layout([10, 3], max_nodes=3)
+    assert len(layout.squares) == 2
+    with pytest.raises(ValueError):
+        draw_nn.get_layout([10, 3], max_nodes=2)
+
+
+def test_dense_layers_are_bundled():
+    layout = draw_nn.get_layout([10, 10, 2], max_edges=50)
+    assert len(layout.bundles) == 1
+    assert len(layout.edges) == 10*2 + 2
+
+
+def test_seeded_layouts_are_cached():
+    layout = draw_nn.get_layout([4, 7, 2], 0.5, seed=1)
+    assert draw_nn.get_layout([4, 7, 2], 0.5, seed=1) is layout
+    assert draw_nn.get_layout([4, 7, 2], 0.5, seed=2) is not layout
+    assert draw_nn.get_layout([4, 7, 2], 0.5) is not draw_nn.get_layout([4, 7, 2], 0.5)
+
+
+def test_unseeded_layouts_use_the_global_seed():
+    np.random.seed(3)
+    layout = draw_nn.get_layout([4, 7, 2], 0.5)
+    np.random.seed(3)
+    again = draw_nn.get_layout([4, 7, 2], 0.5)
+    assert (again.shades == layout.shades).all()
+    assert list(again.circle_colors) == list(layout.circle_colors)
@@ -0,0 +1,97 @@
+import io
+import socket
+import struct
+
+import numpy as np
+from numpy.testing import assert_array_equal
+import matplotlib.pyplot as plt
+from tensorflow.core.util.event_pb2 import Event
+
+from pylib import tensorboardcmd
+from pylib.event_index import EventIndex
+
+
+def record(event):
+    data = event.SerializeToString()
+    # EventIndex does not check the CRCs
+    return struct.pack('<QI', len(data), 0) + data + struct.pack('<I', 0)
+
+
+def scalar_event(step, tag, value):
+    event = Event(step=step, wall_time=1000. + step)
+    event.summary.value.add(tag=tag, simple_value=value)
+    return event
+
+
+def image_event(step, tag, image):
+    buf = io.BytesIO()
+    plt.imsave(buf, image, format='png')
+    event = Event(step=step)
+    value = event.summary.value.add(tag=tag)
+    value.image.encoded_image_string = buf.getvalue()
+    value.image.height, value.image.width = image.shape[:2]
+    return event
+
+
+def test_scalars_are_read_incrementally(tmpdir):
+    events = tmpdir.join('events.out.tfevents.1.host')
+    events.write_binary(record(Event(wall_time=1., file_version='brain.Event:2')) +
+                        record(scalar_event(0, 'loss', 2.)))
+    index = EventIndex(str(tmpdir))
+    assert index.update() == 2
+
+    # A record that is still being written is left for the next update
+    last = record(scalar_event(2, 'loss', .5))
+    events.write(record(scalar_event(1, 'loss', 1.)) + last[:10], mode='ab')
+    assert index.update() == 1
+    events.write(last[10:], mode='ab')
+    assert index.update() == 1
+    assert index.update() == 0
+
+    steps, wall_times, values = index.scalars('loss')
+    assert_array_equal(steps, [0, 1, 2])
+    assert_array_equal(wall_times, [1000., 1001., 1002.])
+    assert_array_equal(values, [2., 1., .5])
+
+
+def test_runs_are_subdirectories(tmpdir):
+    for run in ['train', 'test']:
+        tmpdir.mkdir(run).join('events.out.tfevents.1.host').write_binary(
+            b''.join(record(scalar_event(step, 'accuracy', step / 100.))
+                     for step in range(100)))
+    index = EventIndex(str(tmpdir))
+    index.update()
+    assert index.runs() == ['test', 'train']
+    assert index.tags('train') == (['accuracy'], [])
+    assert len(index.scalars('accuracy', run='test')[0]) == 100
+
+    ax = index.plot_scalars('accuracy', runs='train')
+    assert [line.get_label() for line in ax.get_lines()] == ['train/accuracy']
+    plt.close('all')
+
+
+def test_images_are_read_on_demand(tmpdir):
+    rng = np.random.RandomState(0)
+    images = [rng.uniform(size=(4, 5, 3)) for _ in range(3)]
+    tmpdir.join('events.out.tfevents.1.host').write_binary(b''.join(
+        record(image_event(10 * step, 'kernel/image/0', image))
+        for step, image in enumerate(images)))
+    index = EventIndex(str(tmpdir))
+    index.update()
+    assert index.tags() == ([], ['kernel/image/0'])
+    assert_array_equal(index.image_steps('kernel/image/0'), [0, 10, 20])
+    image = index.image('kernel/image/0', index=1)
+    assert image.shape[:2] == (4, 5)
+    assert np.abs(image[..., :3] - images[1]).max() < 1 / 255. + 1e-6
+
+
+def test_local_ip_falls_back_to_loopback(monkeypatch):
+    def no_address(*args):
+        raise socket.gaierror()
+    monkeypatch.setattr(socket, 'getaddrinfo', no_address)
+    assert tensorboardcmd.local_ip() == '127.0.0.1'
+
+    monkeypatch.setattr(socket, 'getaddrinfo', lambda *args: [
+        (socket.AF_INET, 1, 6, '', ('127.0.1.1', 0)),
+        (socket.AF_INET, 1, 6, '', ('10.0.0.5', 0))])
+    assert tensorboardcmd.local_ip() == '10.0.0.5'
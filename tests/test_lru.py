@@ -0,0 +1,50 @@
+from pylib.lru import LRUCache
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert 'b' not in cache
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert len(cache) == 2
+
+
+def test_sizeof_weighs_entries():
+    cache = LRUCache(10, sizeof=len)
+    cache.put('a', 'x' * 4)
+    cache.put('b', 'x' * 4)
+    cache.put('c', 'x' * 4)
+    assert 'a' not in cache
+    assert cache.size == 8
+
+
+def test_newest_entry_is_kept_even_if_too_big():
+    cache = LRUCache(3, sizeof=len)
+    cache.put('a', 'x')
+    cache.put('b', 'x' * 5)
+    assert 'a' not in cache
+    assert cache.get('b') == 'x' * 5
+
+
+def test_on_evict_sees_evicted_values_only():
+    evicted = []
+    cache = LRUCache(1, on_evict=evicted.append)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.pop('b')
+    cache.put('c', 3)
+    cache.clear()
+    assert evicted == [1]
+    assert len(cache) == 0 and cache.size == 0
+
+
+def test_put_replaces_existing_key():
+    cache = LRUCache(10, sizeof=len)
+    cache.put('a', 'xx')
+    cache.put('a', 'xxx')
+    assert cache.size == 3
+    assert cache.get('missing', 'default') == 'default'
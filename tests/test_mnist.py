@@ -0,0 +1,100 @@
+import gzip
+import struct
+
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+import pytest
+
+from pylib import mnist
+
+
+def write_idx(path, array):
+    header = struct.pack('>BBBB', 0, 0, 0x08, array.ndim)
+    header += struct.pack('>' + 'I' * array.ndim, *array.shape)
+    f = gzip.open(str(path), 'wb')
+    try:
+        f.write(header + array.astype(np.uint8).tostring())
+    finally:
+        f.close()
+
+
+@pytest.fixture
+def source_dir(tmpdir):
+    source_dir = tmpdir.mkdir('source')
+    rng = np.random.RandomState(0)
+    for split, n in [('train', 30), ('test', 10)]:
+        images_file, labels_file = mnist.FILES[split]
+        write_idx(source_dir.join(images_file), rng.randint(0, 256, size=(n, 28, 28)))
+        write_idx(source_dir.join(labels_file), np.arange(n) % mnist.N_CLASSES)
+    return source_dir
+
+
+def test_read_idx(tmpdir):
+    array = np.arange(24, dtype=np.uint8).reshape(2, 3, 4)
+    write_idx(tmpdir.join('array.gz'), array)
+    assert_array_equal(mnist.read_idx(str(tmpdir.join('array.gz'))), array)
+
+    tmpdir.join('bad').write('\x01\x00\x08\x01')
+    with pytest.raises(ValueError):
+        mnist.read_idx(str(tmpdir.join('bad')))
+
+
+def test_seed_cache_without_download(tmpdir):
+    with pytest.raises(IOError):
+        mnist.seed_cache(str(tmpdir), str(tmpdir.join('cache')), download=False)
+
+
+def test_load_mnist_splits(source_dir, tmpdir):
+    cache_dir = str(tmpdir.join('cache'))
+    data = mnist.load_mnist(str(source_dir), validation_size=5, cache_dir=cache_dir,
+                            download=False)
+    assert data.train.num_examples == 25
+    assert data.validation.num_examples == 5
+    assert data.test.num_examples == 10
+    assert isinstance(data.train.raw_images, np.memmap)
+
+    raw = mnist.read_idx(str(source_dir.join(mnist.FILES['train'][0])))
+    assert data.validation.images.shape == (5, 784)
+    assert data.validation.images.dtype == np.float32
+    assert_allclose(data.validation.images, raw[:5].reshape(5, -1) / 255.)
+    assert_array_equal(data.validation.labels, np.eye(10)[np.arange(5)])
+
+    # Once seeded, the IDX files are not needed any more
+    source_dir.remove()
+    data = mnist.load_mnist(str(source_dir), cache_dir=cache_dir, validation_size=5)
+    assert data.test.num_examples == 10
+
+
+def test_next_batch_covers_each_epoch(source_dir, tmpdir):
+    data = mnist.load_mnist(str(source_dir), one_hot=False, validation_size=5,
+                            cache_dir=str(tmpdir.join('cache')), seed=0)
+    labels = [data.test.next_batch(5)[1] for _ in range(2)]
+    assert sorted(np.concatenate(labels)) == list(range(10))
+    assert data.test.epochs_completed == 1
+
+
+@pytest.mark.parametrize('prefetch', [0, 2])
+def test_batches_match_seeded_stream(source_dir, tmpdir, prefetch):
+    data = mnist.load_mnist(str(source_dir), validation_size=5,
+                            cache_dir=str(tmpdir.join('cache')))
+    batches = data.train.batches(4, prefetch=prefetch, seed=3)
+    stream = mnist._IndexStream(data.train.num_examples, seed=3)
+    try:
+        for _ in range(10):
+            images, labels = batches.next_batch()
+            expected_images, expected_labels = data.train.batch(stream.take(4))
+            assert_array_equal(images, expected_images)
+            assert_array_equal(labels, expected_labels)
+    finally:
+        batches.close()
+
+
+def test_integer_images_are_copied_unscaled(source_dir, tmpdir):
+    data = mnist.load_mnist(str(source_dir), dtype=np.uint8, validation_size=5,
+                            cache_dir=str(tmpdir.join('cache')))
+    images = data.validation.images
+    assert images.dtype == np.uint8
+    assert_array_equal(images, data.validation.raw_images)
+    assert images.flags.writeable
+    images[:] = 0
+    assert data.validation.raw_images.any()
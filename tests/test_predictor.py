@@ -0,0 +1,81 @@
+import numpy as np
+from numpy.testing import assert_allclose
+import pytest
+import tensorflow as tf
+
+from pylib import predictor
+from pylib.predictor import Predictor, get_predictor
+
+
+@pytest.fixture
+def model():
+    with tf.Graph().as_default(), tf.Session() as sess:
+        x = tf.placeholder(tf.float64, [None, 2])
+        scale = tf.placeholder_with_default(np.float64(1.), [])
+        W = tf.Variable([[1.], [-1.]], dtype=tf.float64)
+        y = scale * tf.matmul(x, W)
+        sess.run(tf.global_variables_initializer())
+        yield sess, x, y, W, scale
+
+
+class CountingSession(object):
+
+    def __init__(self, sess):
+        self.sess = sess
+        self.outputs = 0
+
+    def run(self, fetches, feed_dict=None):
+        if not (isinstance(fetches, tf.Tensor) and fetches.op.type == 'Pack'):
+            self.outputs += 1
+        return self.sess.run(fetches, feed_dict)
+
+
+def test_output_is_evaluated_in_chunks(model):
+    sess, x, y, W, _ = model
+    counting = CountingSession(sess)
+    predict = Predictor(counting, x, y, tf.nn.sigmoid, chunk_size=3)
+    inputs = np.arange(20.).reshape(10, 2) / 10
+    result = predict(inputs)
+    assert counting.outputs == 4
+    assert_allclose(result, 1 / (1 + np.exp(-inputs.dot([[1.], [-1.]]))))
+    assert not result.flags.writeable
+
+
+def test_results_are_cached_until_variables_change(model):
+    sess, x, y, W, scale = model
+    counting = CountingSession(sess)
+    predict = Predictor(counting, x, y)
+    inputs = np.ones((5, 2))
+    assert predict.variables == [W]
+
+    first = predict(inputs)
+    assert predict(inputs.copy()) is first
+    assert counting.outputs == 1
+
+    # Other extra feeds are other results
+    assert_allclose(predict(inputs, {scale: 2.}), 2 * first)
+    assert counting.outputs == 2
+
+    sess.run(W.assign([[2.], [0.]]))
+    assert_allclose(predict(inputs), 2 * np.ones((5, 1)))
+    assert counting.outputs == 3
+
+
+def test_get_predictor_adds_no_ops(model):
+    sess, x, y, _, _ = model
+    predict = get_predictor(sess, x, y, tf.nn.sigmoid)
+    n_ops = len(sess.graph.get_operations())
+    assert get_predictor(sess, x, y, tf.nn.sigmoid) is predict
+    assert len(sess.graph.get_operations()) == n_ops
+    assert get_predictor(sess, x, y) is not predict
+    assert len(predictor._predictors) <= predictor.PREDICTOR_CACHE_SIZE
+
+
+def test_predictors_of_old_graphs_are_dropped(model):
+    sess, x, y, _, _ = model
+    get_predictor(sess, x, y)
+    with tf.Graph().as_default() as graph, tf.Session() as other_sess:
+        x2 = tf.placeholder(tf.float64, [None, 2])
+        get_predictor(other_sess, x2, 2 * x2)
+        assert len(predictor._predictors) == 1
+        assert all(p.output.graph is graph for p in predictor._predictors.values())
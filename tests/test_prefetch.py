@@ -0,0 +1,54 @@
+import itertools
+
+import pytest
+
+from pylib.prefetch import Prefetcher
+
+
+class Counter(Prefetcher):
+    def __init__(self, prefetch):
+        self.count = itertools.count()
+        super(Counter, self).__init__(prefetch)
+
+    def make_batch(self):
+        return next(self.count)
+
+
+def test_batches_arrive_in_order():
+    batches = Counter(prefetch=2)
+    assert [batches.next_batch() for _ in range(5)] == [0, 1, 2, 3, 4]
+    batches.close()
+
+
+def test_without_prefetch_batches_are_made_on_demand():
+    batches = Counter(prefetch=0)
+    assert list(itertools.islice(batches, 3)) == [0, 1, 2]
+    assert next(batches.count) == 3
+
+
+class Failing(Counter):
+    def make_batch(self):
+        n = next(self.count)
+        if n == 2:
+            raise ZeroDivisionError("batch %d" % n)
+        return n
+
+
+def test_errors_on_the_thread_are_raised_by_next_batch():
+    batches = Failing(prefetch=2)
+    assert [batches.next_batch() for _ in range(2)] == [0, 1]
+    with pytest.raises(ZeroDivisionError):
+        batches.next_batch()
+    # The thread has stopped, and the error is raised again
+    with pytest.raises(ZeroDivisionError):
+        batches.next_batch()
+    assert next(batches.count) == 3
+
+
+@pytest.mark.parametrize('prefetch', [0, 2])
+def test_next_batch_after_close_raises(prefetch):
+    batches = Counter(prefetch)
+    batches.next_batch()
+    batches.close()
+    with pytest.raises(ValueError):
+        batches.next_batch()
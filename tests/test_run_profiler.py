@@ -0,0 +1,73 @@
+import json
+
+import numpy as np
+from numpy.testing import assert_allclose
+import pytest
+import tensorflow as tf
+
+from pylib.run_profiler import ProfiledSession
+
+
+@pytest.fixture
+def model():
+    with tf.Graph().as_default(), tf.Session() as sess:
+        x = tf.placeholder(tf.float32, [None, 3])
+        W = tf.Variable(np.ones((3, 2), dtype=np.float32), name='W')
+        y = tf.matmul(x, W, name='product')
+        sess.run(tf.global_variables_initializer())
+        yield sess, x, y
+
+
+def test_calls_are_recorded(model):
+    sess, x, y = model
+    psess = ProfiledSession(sess)
+    # The feed is converted to the placeholder's dtype
+    assert_allclose(psess.run(y, {x: [[1, 2, 3]]}), [[6., 6.]])
+    assert psess.graph is sess.graph
+
+    stats, = psess.calls
+    assert stats.feed_bytes == 3 * 4
+    assert stats.fetch_bytes == 2 * 4
+    assert stats.run > 0
+    assert np.isnan(stats.device) and np.isnan(stats.host)
+    assert psess.op_table() == []
+
+
+def test_sampled_calls_are_traced(model, tmpdir):
+    sess, x, y = model
+    trace_path = str(tmpdir.join('timeline.json'))
+    psess = ProfiledSession(sess, sample_every=2, trace_path=trace_path)
+    for _ in range(6):
+        psess.run([y], {x: np.ones((4, 3))})
+
+    # The first call is a warm-up call, and is not sampled
+    devices = [stats.device for stats in psess.calls]
+    assert [not np.isnan(device) for device in devices] == [False, True, False, True,
+                                                            False, True]
+    calls = dict((stats.name, stats.calls) for stats in psess.op_table())
+    assert calls['product'] == 3
+    assert 'traceEvents' in json.load(open(trace_path))
+
+    summary = psess.call_summary()
+    assert summary.fetch_bytes == 4 * 2 * 4
+    assert not np.isnan(summary.device)
+    sampled = psess.call_summary(sampled=True)
+    runs = [stats.run for stats in psess.calls[1::2]]
+    assert_allclose(sampled.run, np.mean(runs))
+    assert sampled.device <= sampled.run
+    assert_allclose(sampled.device + sampled.host, sampled.run)
+    assert_allclose(summary.host, sampled.host)
+    first, second = psess.report().split('\n')[:2]
+    assert first.startswith('6 calls,')
+    assert second.startswith('3 sampled calls, per call: run')
+
+    psess.reset()
+    assert psess.report() == 'No calls recorded'
+
+
+def test_warmup_can_be_turned_off(model):
+    sess, x, y = model
+    psess = ProfiledSession(sess, sample_every=3, warmup=0)
+    for _ in range(4):
+        psess.run(y, {x: np.ones((1, 3))})
+    assert [not np.isnan(stats.device) for stats in psess.calls] == [True, False, False, True]
@@ -0,0 +1,52 @@
+# coding=utf-8
+import numpy as np
+from numpy.testing import assert_array_equal
+import pytest
+
+from pylib.sequence_batcher import SequenceBatcher, decode_text, encode_text
+
+
+def test_encode_text_round_trips():
+    text = 'hello world'
+    data, chars = encode_text(text)
+    assert data.dtype == np.uint8
+    assert chars == sorted(set(text))
+    assert decode_text(data, chars) == text
+
+
+def test_encode_text_with_given_chars():
+    data, chars = encode_text(u'caf\xe9 cab', chars=[u'\xe9', u'c', u'a', u'b', u'f', u' '])
+    assert_array_equal(data, [1, 2, 4, 0, 5, 1, 2, 3])
+    with pytest.raises(ValueError):
+        encode_text('abc', chars=['a', 'b'])
+
+
+def test_batches_are_shifted_windows():
+    data = np.arange(100) % 7
+    batches = SequenceBatcher(data, batch_size=8, time_steps=10, prefetch=0, seed=0)
+    x_batch, y_batch = batches.next_batch()
+    assert x_batch.shape == y_batch.shape == (8, 10)
+    assert_array_equal(x_batch[:, 1:], y_batch[:, :-1])
+    for x in x_batch:
+        # Every row is a contiguous slice of the data
+        start = [i for i in range(91) if (data[i:i+10] == x).all()]
+        assert start
+
+
+def test_batch_starts_are_distinct():
+    batches = SequenceBatcher(np.arange(30), batch_size=20, time_steps=10, prefetch=0, seed=1)
+    x_batch, _ = batches.next_batch()
+    assert len(set(x_batch[:, 0])) == 20
+
+
+def test_prefetched_batches():
+    batches = SequenceBatcher(np.arange(50), batch_size=4, time_steps=5, prefetch=2, seed=2)
+    for _ in range(5):
+        x_batch, y_batch = batches.next_batch()
+        assert_array_equal(x_batch + 1, y_batch)
+    batches.close()
+
+
+def test_data_too_short():
+    with pytest.raises(ValueError):
+        SequenceBatcher(np.arange(10), batch_size=8, time_steps=5)
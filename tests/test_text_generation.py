@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from pylib.text_generation import StreamingTextGenerator
+
+CHARS = list('abcde')
+
+
+def next_char_step(x_enc, state):
+    """ A stand-in model that always predicts the next character of CHARS. """
+    shifted = tf.concat([x_enc[..., -1:], x_enc[..., :-1]], axis=-1)
+    return 100. * shifted, state + 1.
+
+
+@pytest.fixture
+def sess():
+    with tf.Graph().as_default(), tf.Session() as sess:
+        yield sess
+
+
+def test_generate_text_in_chunks(sess):
+    generator = StreamingTextGenerator(next_char_step, CHARS, state_size=3,
+                                       batch_size=2, chunk_size=4)
+    sess.run(tf.global_variables_initializer())
+    chunks = list(generator.generate(sess, ['ab', 'da'], 10))
+    assert [len(chunk[0]) for chunk in chunks] == [5, 4, 1]
+    texts = generator.generate_text(sess, ['ab', 'da'], 10)
+    assert texts == ['ab' + 'cdeabcdeab', 'da' + 'bcdeabcdea']
+
+
+def test_state_carries_over_between_chunks(sess):
+    generator = StreamingTextGenerator(next_char_step, CHARS, state_size=3, chunk_size=4)
+    sess.run(tf.global_variables_initializer())
+    generator.generate_text(sess, 'abc', 9)
+    # One call to prime, then one per character after the first
+    np.testing.assert_allclose(sess.run(generator.state), [[1 + 8] * 3])
+
+
+def test_priming_needs_no_initializer(sess):
+    # Priming assigns the generator's variables, so they need no initializer
+    generator = StreamingTextGenerator(next_char_step, CHARS, state_size=3)
+    assert generator.generate_text(sess, 'a', 3) == ['abcd']
+
+
+def test_nothing_is_generated_for_zero_length(sess):
+    generator = StreamingTextGenerator(next_char_step, CHARS, state_size=3)
+    sess.run(tf.global_variables_initializer())
+    assert list(generator.generate(sess, 'ab', 0)) == []
+    assert generator.generate_text(sess, 'ab', 0) == ['ab']
+
+
+def test_prompts_must_match_batch(sess):
+    generator = StreamingTextGenerator(next_char_step, CHARS, state_size=3, batch_size=2)
+    sess.run(tf.global_variables_initializer())
+    with pytest.raises(ValueError):
+        generator.prime(sess, ['ab'])
+    with pytest.raises(ValueError):
+        generator.prime(sess, ['ab', 'abc'])
@@ -0,0 +1,53 @@
+import numpy as np
+from numpy.testing import assert_allclose
+import tensorflow as tf
+
+from pylib.tf_iterate import FusedIteration
+
+
+def test_newton_iteration_stops_at_tolerance():
+    with tf.Graph().as_default(), tf.Session() as sess:
+        newton = FusedIteration(lambda x: x - (x**2 - 2) / (2*x),
+                                initial=[2.], max_steps=50, tol=1e-12)
+        trajectory = newton.run(sess)
+        assert trajectory.steps < 10
+        assert_allclose(trajectory.states[0][-1], [np.sqrt(2)])
+        # The initial state is recorded too
+        assert len(trajectory.states[0]) == trajectory.steps + 1
+        assert_allclose(trajectory.states[0][0], [2.])
+
+
+def test_n_steps_can_be_overridden():
+    with tf.Graph().as_default(), tf.Session() as sess:
+        halve = FusedIteration(lambda x: x / 2., initial=[np.float64(8.)], max_steps=10)
+        assert halve.run(sess).steps == 10
+        trajectory = halve.run(sess, n_steps=2)
+        assert trajectory.steps == 2
+        assert_allclose(trajectory.final, [2.])
+
+
+def test_gradient_descent_updates_variables_and_records_loss():
+    rng = np.random.RandomState(0)
+    X = rng.normal(size=(50, 2))
+    y = X.dot([[1.], [-2.]]) + 0.5
+    with tf.Graph().as_default(), tf.Session() as sess:
+        x = tf.placeholder(tf.float64, [None, 2])
+        y_label = tf.placeholder(tf.float64, [None, 1])
+        W = tf.Variable(np.zeros((2, 1)))
+        b = tf.Variable(np.zeros(1))
+
+        def loss_of(W, b):
+            return tf.reduce_mean((tf.matmul(x, W) + b - y_label)**2)
+
+        def step(W, b):
+            grad_W, grad_b = tf.gradients(loss_of(W, b), [W, b])
+            return W - 0.1 * grad_W, b - 0.1 * grad_b
+
+        sess.run(tf.global_variables_initializer())
+        gd = FusedIteration(step, variables=[W, b], max_steps=300, record=loss_of)
+        trajectory = gd.run(sess, feed_dict={x: X, y_label: y})
+        losses = trajectory.records[0]
+        assert losses.shape == (301,)
+        assert (np.diff(losses) <= 1e-12).all()
+        assert_allclose(sess.run(W), [[1.], [-2.]], atol=1e-3)
+        assert_allclose(sess.run(b), [0.5], atol=1e-3)
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from pylib.tf_session import SessionManager, reset_tf, reset_vars
+
+
+def build_counter(start=0.):
+    counter = tf.Variable(start, name='counter')
+    return {'counter': counter, 'increment': tf.assign_add(counter, 1.)}
+
+
+def test_models_are_cached_per_hyperparameters():
+    manager = SessionManager()
+    model = manager.get(build_counter, start=1.)
+    assert manager.get(build_counter, start=1.) is model
+    assert manager.get(build_counter, start=2.) is not model
+    manager.clear()
+
+
+def test_reset_reinitializes_variables():
+    manager = SessionManager()
+    model = manager.get(build_counter)
+    model.run(model['increment'])
+    model = manager.get(build_counter, reset=False)
+    assert model.run(model['counter']) == 1.
+    model = manager.get(build_counter)
+    assert model.run(model['counter']) == 0.
+    manager.clear()
+
+
+def test_init_new_vars_keeps_trained_values():
+    manager = SessionManager()
+    model = manager.get(build_counter)
+    model.run(model['increment'])
+    with model.graph.as_default():
+        extra = tf.Variable(5., name='extra')
+    assert model.init_new_vars() == ['extra']
+    assert model.run([model['counter'], extra]) == [1., 5.]
+    assert model.init_new_vars() == []
+    manager.clear()
+
+
+def test_least_recently_used_model_is_closed():
+    manager = SessionManager(max_graphs=2)
+    first = manager.get(build_counter, start=1.)
+    second = manager.get(build_counter, start=2.)
+    manager.get(build_counter, start=1.)
+    manager.get(build_counter, start=3.)
+    assert manager.get(build_counter, start=1.) is first
+    assert manager.get(build_counter, start=2.) is not second
+    with pytest.raises(RuntimeError):
+        second.run(second['counter'])
+    manager.clear()
+
+
+def test_reset_tf_returns_a_fresh_session():
+    sess = reset_tf()
+    x = tf.Variable(np.ones(3), name='x')
+    reset_vars()
+    np.testing.assert_allclose(sess.run(x), np.ones(3))
+    assert reset_tf() is not sess
+    assert tf.get_default_graph().get_operations() == []
@@ -0,0 +1,47 @@
+import numpy as np
+from numpy.testing import assert_allclose
+import tensorflow as tf
+
+from pylib.tf_sweep import LearningRateSweep, linear_model
+
+
+def mse(params, x, y_label):
+    W, b = params
+    y = linear_model(x, W, b)
+    return tf.reduce_mean(tf.square(y - y_label), axis=[1, 2])
+
+
+def numpy_descent(X, y, eta, n_steps):
+    """ Gradient descent on the mean squared error of one linear model. """
+    W, b = np.zeros((X.shape[1], 1)), np.zeros(1)
+    losses = []
+    for step in range(n_steps):
+        error = X.dot(W) + b - y
+        losses.append(np.mean(error**2))
+        W, b = W - eta * 2 * X.T.dot(error) / len(X), b - eta * 2 * error.mean(axis=0)
+    losses.append(np.mean((X.dot(W) + b - y)**2))
+    return np.array(losses), W
+
+
+def test_sweep_matches_separate_runs():
+    rng = np.random.RandomState(0)
+    X = rng.normal(size=(40, 3)).astype(np.float32)
+    y = X.dot([[1.], [0.], [-1.]]) + 0.25
+    etas = [0.01, 0.05, 0.2]
+    with tf.Graph().as_default(), tf.Session() as sess:
+        x = tf.placeholder(tf.float32, [None, 3])
+        y_label = tf.placeholder(tf.float32, [None, 1])
+        sweep = LearningRateSweep(mse, [np.zeros((3, 1)), np.zeros(1)], etas,
+                                  x, y_label, n_steps=15)
+        result = sweep.run(sess, {x: X, y_label: y})
+        assert result.losses.shape == (3, 16)
+        assert result.params[0].shape == (3, 16, 3, 1)
+        for k, eta in enumerate(etas):
+            losses, W = numpy_descent(X, y, eta, 15)
+            assert_allclose(result.losses[k], losses, rtol=1e-4)
+            assert_allclose(result.params[0][k, -1], W, rtol=1e-4, atol=1e-6)
+
+        # Other learning rates can be fed without rebuilding the graph
+        result = sweep.run(sess, {x: X, y_label: y}, etas=[0.1, 0.1, 0.1], n_steps=5)
+        assert result.losses.shape == (3, 6)
+        assert_allclose(result.losses[0], result.losses[2])
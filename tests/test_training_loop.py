@@ -0,0 +1,73 @@
+import pytest
+
+from pylib.training_loop import AsyncSummaryWriter, TrainingLoop
+
+
+class FakeSession(object):
+    """ Evaluates each fetch name to the number of the run it is in. """
+
+    def __init__(self):
+        self.runs = []
+
+    def run(self, fetches, feed_dict=None):
+        self.runs.append(sorted(fetches))
+        return {key: '%s@%d' % (value, len(self.runs) - 1) for key, value in fetches.items()}
+
+
+class FakeWriter(object):
+
+    def __init__(self, fail=False):
+        self.summaries = []
+        self.flushes = 0
+        self.fail = fail
+
+    def add_summary(self, summary, global_step=None):
+        if self.fail:
+            raise IOError("disk full")
+        self.summaries.append((summary, global_step))
+
+    def flush(self):
+        self.flushes += 1
+
+
+def test_summaries_are_fetched_with_the_training_step():
+    sess, writer = FakeSession(), FakeWriter()
+    loop = TrainingLoop(sess, 'train', 'merged', writer, every_n_steps=3)
+    results = [loop.run(fetches='acc', summary_fetches='loss', force_summary=(i == 4))
+               for i in range(7)]
+    loop.close()
+
+    assert [summary for _, summary in results] == [
+        'loss@0', None, None, 'loss@3', 'loss@4', None, 'loss@6']
+    assert results[1][0] == 'acc@1'
+    assert sess.runs[0] == ['summary', 'summary_values', 'train', 'values']
+    assert sess.runs[1] == ['train', 'values']
+    assert writer.summaries == [('merged@0', 0), ('merged@3', 3), ('merged@4', 4),
+                                ('merged@6', 6)]
+    assert writer.flushes >= 1
+
+    overhead = loop.overhead()
+    assert (overhead.steps, overhead.summary_steps) == (7, 4)
+    assert 0 <= overhead.fraction <= 1
+    assert loop.report().startswith('7 steps in')
+
+
+def test_summaries_every_n_seconds():
+    sess = FakeSession()
+    loop = TrainingLoop(sess, 'train', 'merged', every_n_steps=None, every_n_secs=3600)
+    for _ in range(5):
+        loop.run()
+    assert [run for run in sess.runs if 'summary' in run] == [['summary', 'train']]
+    assert loop.overhead().summary_steps == 1
+
+    with pytest.raises(ValueError):
+        TrainingLoop(sess, 'train', every_n_steps=None)
+
+
+def test_async_writer_raises_write_errors():
+    writer = AsyncSummaryWriter(FakeWriter(fail=True), flush_secs=0.01)
+    writer.add_summary('summary', 0)
+    with pytest.raises(IOError):
+        writer.close()
+    with pytest.raises(IOError):
+        writer.add_summary('summary', 1)